@@ -0,0 +1,56 @@
+"""post drafts packs jsonb
+
+Revision ID: 3c9d1e7a4b52
+Revises: 605577e7ac1b
+Create Date: 2026-10-15 14:05:12.418093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d1e7a4b52'
+down_revision: Union[str, Sequence[str], None] = '605577e7ac1b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("shoot_pack", "broll_manifest")
+
+
+def upgrade() -> None:
+    # Old rows hold indented JSON text. Anything that doesn't parse is kept as the same
+    # {"_error": true, "_raw": ...} object the templates already render for bad JSON.
+    op.execute(
+        """
+        CREATE FUNCTION pg_temp.to_jsonb_or_error(raw text) RETURNS jsonb AS $$
+        BEGIN
+            RETURN raw::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN jsonb_build_object('_error', true, '_raw', raw);
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for col in COLUMNS:
+        op.alter_column(
+            "post_drafts",
+            col,
+            type_=postgresql.JSONB(),
+            existing_nullable=True,
+            postgresql_using=f"pg_temp.to_jsonb_or_error(NULLIF({col}, ''))",
+        )
+
+
+def downgrade() -> None:
+    for col in COLUMNS:
+        op.alter_column(
+            "post_drafts",
+            col,
+            type_=sa.Text(),
+            existing_nullable=True,
+            postgresql_using=f"jsonb_pretty({col})",
+        )
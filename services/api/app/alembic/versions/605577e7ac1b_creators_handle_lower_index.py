@@ -0,0 +1,122 @@
+"""creators handle lower index
+
+Revision ID: 605577e7ac1b
+Revises: f8af46d2ad90
+Create Date: 2026-10-15 10:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '605577e7ac1b'
+down_revision: Union[str, Sequence[str], None] = 'f8af46d2ad90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables whose creator_id must follow a merged creator; (table, partition) for the ones
+# with a unique key on it, where only one row per merged key can survive.
+_REPOINT = ("creator_posts", "creator_signals", "outreach_drafts")
+_REPOINT_UNIQUE = (
+    ("creator_metrics_daily", "snapshot_date"),
+    ("creator_relationships", None),
+)
+
+
+def _merge_case_variant_handles() -> None:
+    """
+    Rows that differ only by handle case (possible before this revision) are merged into
+    one creator so the unique index below can be built: the keeper is the already-lowercase
+    row, else the oldest. Everything pointing at the others is re-pointed to it; where
+    that would break a unique key, the keeper's own row (else the oldest) wins.
+    """
+    op.execute(
+        """
+        CREATE TEMP TABLE creator_merge AS
+        SELECT id AS dup_id, keep_id
+        FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY lower(handle) ORDER BY (handle = lower(handle)) DESC, id
+            ) AS keep_id
+            FROM creators
+        ) ranked
+        WHERE id <> keep_id
+        """
+    )
+
+    for table, key in _REPOINT_UNIQUE:
+        extra = f", {key}" if key else ""
+        op.execute(
+            f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM (
+                    SELECT t.id, row_number() OVER (
+                        PARTITION BY coalesce(m.keep_id, t.creator_id){extra}
+                        ORDER BY (m.dup_id IS NOT NULL), t.id
+                    ) AS rn
+                    FROM {table} t
+                    LEFT JOIN creator_merge m ON m.dup_id = t.creator_id
+                ) ranked
+                WHERE rn > 1
+            )
+            """
+        )
+
+    for table in _REPOINT + tuple(t for t, _ in _REPOINT_UNIQUE):
+        op.execute(
+            f"UPDATE {table} t SET creator_id = m.keep_id FROM creator_merge m WHERE t.creator_id = m.dup_id"
+        )
+
+    # edges reference creators on both ends; merging can also turn an edge into a self-loop
+    op.execute(
+        """
+        DELETE FROM creator_edges WHERE id IN (
+            SELECT id FROM (
+                SELECT e.id,
+                       coalesce(ms.keep_id, e.source_creator_id) AS src,
+                       coalesce(mt.keep_id, e.target_creator_id) AS dst,
+                       (ms.dup_id IS NOT NULL OR mt.dup_id IS NOT NULL) AS moved,
+                       row_number() OVER (
+                           PARTITION BY coalesce(ms.keep_id, e.source_creator_id),
+                                        coalesce(mt.keep_id, e.target_creator_id),
+                                        e.edge_type
+                           ORDER BY (ms.dup_id IS NOT NULL OR mt.dup_id IS NOT NULL), e.id
+                       ) AS rn
+                FROM creator_edges e
+                LEFT JOIN creator_merge ms ON ms.dup_id = e.source_creator_id
+                LEFT JOIN creator_merge mt ON mt.dup_id = e.target_creator_id
+            ) ranked
+            WHERE rn > 1 OR (moved AND src = dst)
+        )
+        """
+    )
+    op.execute(
+        "UPDATE creator_edges e SET source_creator_id = m.keep_id FROM creator_merge m WHERE e.source_creator_id = m.dup_id"
+    )
+    op.execute(
+        "UPDATE creator_edges e SET target_creator_id = m.keep_id FROM creator_merge m WHERE e.target_creator_id = m.dup_id"
+    )
+
+    op.execute("DELETE FROM creators c USING creator_merge m WHERE c.id = m.dup_id")
+    op.execute("DROP TABLE creator_merge")
+
+
+def upgrade() -> None:
+    _merge_case_variant_handles()
+
+    # Handles are case-insensitive on IG: lookups filter on lower(handle), and this index
+    # both serves them and rejects case-variant duplicates.
+    op.create_index(
+        "ix_creators_handle_lower",
+        "creators",
+        [sa.text("lower(handle)")],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_creators_handle_lower", table_name="creators")
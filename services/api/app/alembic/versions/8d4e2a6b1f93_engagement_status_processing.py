@@ -0,0 +1,35 @@
+"""engagement status processing
+
+Revision ID: 8d4e2a6b1f93
+Revises: 3c9d1e7a4b52
+Create Date: 2026-10-15 16:40:27.551842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4e2a6b1f93'
+down_revision: Union[str, Sequence[str], None] = '3c9d1e7a4b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Workers claim comment actions by moving them to 'processing' while drafting.
+    op.execute("ALTER TYPE engagementstatus ADD VALUE IF NOT EXISTS 'processing' AFTER 'pending'")
+
+
+def downgrade() -> None:
+    # Postgres can't drop an enum value: hand claimed rows back and rebuild the type.
+    op.execute("UPDATE engagement_actions SET status = 'pending', scheduled_for = NULL WHERE status = 'processing'")
+    op.execute("ALTER TYPE engagementstatus RENAME TO engagementstatus_old")
+    op.execute("CREATE TYPE engagementstatus AS ENUM ('pending', 'approved', 'executed', 'skipped', 'failed')")
+    op.execute(
+        "ALTER TABLE engagement_actions ALTER COLUMN status TYPE engagementstatus "
+        "USING status::text::engagementstatus"
+    )
+    op.execute("DROP TYPE engagementstatus_old")
@@ -1,13 +1,17 @@
 import os
 import logging
 import structlog
-import csv, io
+import csv
+from io import StringIO
 
+import redis
 from celery import Celery
-from fastapi import FastAPI, Depends, Header, HTTPException, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Request, Form, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from datetime import datetime, date, time, timedelta
 
@@ -88,10 +92,66 @@ CREATOR_GRAPH_TASK = os.getenv("CREATOR_GRAPH_TASK", "tasks.creator_graph_update
 VIRAL_PATTERNS_TASK = os.getenv("VIRAL_PATTERNS_TASK", "tasks.viral_patterns_daily")
 
 celery_client = Celery("h2n_api_client", broker=REDIS_URL, backend=REDIS_URL)
+# same wire format as the worker (services/worker/app/celery_app.py)
+celery_client.conf.update(
+    task_serializer="msgpack",
+    result_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_accept_content=["msgpack", "json"],
+)
+redis_client = redis.Redis.from_url(REDIS_URL)
+
+# Settings are read on most admin pages but only change via the /settings/* writers,
+# so the whole table is cached in Redis. SETTINGS_GEN is bumped on every write; a
+# cached payload from an older generation is treated as a miss.
+SETTINGS_CACHE_KEY = "settings:cache"
+SETTINGS_GEN_KEY = "SETTINGS_GEN"
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "30"))
+
+CONTENT_INTEL_COOLDOWN_KEY = "content_intel:cooldown"
 
 def now_utc():
     return datetime.utcnow()
 
+def load_settings_map(db: Session) -> dict:
+    """All settings as {key: value}, served from Redis when the cache is warm."""
+    gen = None
+    try:
+        gen, cached = redis_client.mget(SETTINGS_GEN_KEY, SETTINGS_CACHE_KEY)
+        if cached:
+            payload = json.loads(cached)
+            if payload.get("gen") == (gen.decode() if gen else None):
+                return payload["settings"]
+    except (redis.RedisError, ValueError):
+        pass
+
+    settings_map = {s.key: s.value for s in db.query(Setting).all()}
+    try:
+        payload = {"gen": gen.decode() if gen else None, "settings": settings_map}
+        redis_client.setex(SETTINGS_CACHE_KEY, SETTINGS_CACHE_TTL, json.dumps(payload))
+    except redis.RedisError:
+        pass
+    return settings_map
+
+def upsert_setting(db: Session, key: str, value: str, now: datetime | None = None) -> None:
+    """Single-statement INSERT ... ON CONFLICT for a settings row (no commit)."""
+    now = now or now_utc()
+    stmt = pg_insert(Setting).values(key=key, value=value, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Setting.key],
+        set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+    )
+    db.execute(stmt)
+
+def invalidate_settings_cache() -> None:
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(SETTINGS_GEN_KEY)
+        pipe.delete(SETTINGS_CACHE_KEY)
+        pipe.execute()
+    except redis.RedisError:
+        log.warning("settings_cache_invalidate_failed")
+
 def get_session_user(request: Request):
     token = request.cookies.get(COOKIE_NAME)
     if not token:
@@ -170,7 +230,7 @@ def admin_home(
     pending_posts = db.query(PostDraft).filter(PostDraft.status == ApprovalStatus.pending).count()
     pending_eng = db.query(EngagementQueueItem).filter(EngagementQueueItem.status == ApprovalStatus.pending).count()
     pending_out = db.query(OutreachDraft).filter(OutreachDraft.status == ApprovalStatus.pending).count()
-    settings_map = {s.key: s.value for s in db.query(Setting).all()}
+    settings_map = load_settings_map(db)
 
     return templates.TemplateResponse("admin.html", {
         "request": request,
@@ -234,7 +294,7 @@ def admin_import_creators(
 ):
     raw = file.file.read()
     text = raw.decode("utf-8", errors="ignore")
-    reader = csv.DictReader(io.StringIO(text))
+    reader = csv.DictReader(StringIO(text))
 
     created, updated, skipped = 0, 0, 0
 
@@ -248,7 +308,7 @@ def admin_import_creators(
         notes = (row.get("notes") or "").strip()
         source = (row.get("source") or "h2n_top_followers").strip()
 
-        existing = db.query(Creator).filter(Creator.handle == h).first()
+        existing = db.query(Creator).filter(func.lower(Creator.handle) == h).first()
         if existing:
             # light update only
             if notes:
@@ -581,12 +641,13 @@ def admin_set_creator_relationship(
 @app.post("/admin/creators/discover")
 def admin_creators_discover(
     request: Request,
+    background_tasks: BackgroundTasks,
     limit: int = Form(200),
     rotate: int = Form(4),
     user: str = Depends(require_admin),
 ):
     # Fire and forget celery task
-    celery_client.send_task(CREATOR_DISCOVERY_TASK, kwargs={"limit": int(limit), "rotate": int(rotate)})
+    background_tasks.add_task(celery_client.send_task, CREATOR_DISCOVERY_TASK, kwargs={"limit": int(limit), "rotate": int(rotate)})
     return RedirectResponse(url="/admin/creators", status_code=303)
 
 ### Set creator outreach status
@@ -617,21 +678,24 @@ def set_creator_outreach_status(
 @app.post("/admin/creators/score")
 def admin_creators_score(
     request: Request,
+    background_tasks: BackgroundTasks,
     limit: int = Form(200),
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(SCORE_CREATORS_TASK, kwargs={"limit": int(limit)})
+    background_tasks.add_task(celery_client.send_task, SCORE_CREATORS_TASK, kwargs={"limit": int(limit)})
     return RedirectResponse(url="/admin?msg=Scoring+creators...+refresh+in+30-90+seconds", status_code=303)
 
 
 @app.post("/admin/creators/graph")
 def admin_creators_graph(
     request: Request,
+    background_tasks: BackgroundTasks,
     limit_creators: int = Form(200),
     similarity_top_k: int = Form(25),
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(
+    background_tasks.add_task(
+        celery_client.send_task,
         CREATOR_GRAPH_TASK,
         kwargs={"limit_creators": int(limit_creators), "similarity_top_k": int(similarity_top_k)},
     )
@@ -650,7 +714,7 @@ def admin_graph(
 
     if handle:
         h = handle.lstrip("@").strip().lower()
-        creator = db.query(Creator).filter(Creator.handle == h).first()
+        creator = db.query(Creator).filter(func.lower(Creator.handle) == h).first()
         if creator:
             edges = (
                 db.query(CreatorEdge)
@@ -690,10 +754,11 @@ def admin_patterns(
 @app.post("/admin/patterns/run")
 def admin_patterns_run(
     request: Request,
+    background_tasks: BackgroundTasks,
     limit_posts: int = Form(500),
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(VIRAL_PATTERNS_TASK, kwargs={"limit_posts": int(limit_posts)})
+    background_tasks.add_task(celery_client.send_task, VIRAL_PATTERNS_TASK, kwargs={"limit_posts": int(limit_posts)})
     return RedirectResponse(url="/admin/patterns", status_code=303)
 
 # --- Admin Logs ---
@@ -849,9 +914,10 @@ def add_engagement_targets(
 
 @app.post("/admin/engagement/generate")
 def generate_engagement_queue(
+    background_tasks: BackgroundTasks,
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(BUILD_ENGAGEMENT_QUEUE_TASK, args=[])
+    background_tasks.add_task(celery_client.send_task, BUILD_ENGAGEMENT_QUEUE_TASK, args=[])
     return RedirectResponse(url="/admin/engagement?view=pending", status_code=303)
 
 ### Approve engagement
@@ -1037,12 +1103,13 @@ def create_outreach_campaign(
 ### Generate outreach drafts
 @app.post("/admin/outreach/generate")
 def admin_outreach_generate(
+    background_tasks: BackgroundTasks,
     campaign_id: int = Form(...),
     limit: int = Form(20),
     db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(BUILD_OUTREACH_BATCH_TASK, args=[campaign_id], kwargs={"limit": limit})
+    background_tasks.add_task(celery_client.send_task, BUILD_OUTREACH_BATCH_TASK, args=[campaign_id], kwargs={"limit": limit})
     return RedirectResponse(url=f"/admin/outreach?campaign_id={campaign_id}", status_code=303)
 
 ### Export outreach csv
@@ -1051,76 +1118,83 @@ def export_outreach_csv(
     request: Request,
     campaign_id: int | None = None,
     view: str = "approved",  # approved/sent/replied/booked/all
-    db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
-    q = db.query(OutreachDraft).join(Creator, OutreachDraft.creator_id == Creator.id)
+    def one_line(col):
+        return func.coalesce(func.btrim(func.replace(col, func.chr(10), " ")), "")
+
+    def iso(col):
+        return func.coalesce(func.to_char(col, 'YYYY-MM-DD"T"HH24:MI:SS.US'), "")
+
+    q = (
+        select(
+            OutreachDraft.id.label("draft_id"),
+            Creator.handle.label("creator_handle"),
+            Creator.platform.label("platform"),
+            func.coalesce(OutreachDraft.campaign_name, "").label("campaign"),
+            OutreachDraft.status.label("approval_status"),
+            OutreachDraft.outreach_status.label("outreach_status"),
+            one_line(OutreachDraft.message).label("message"),
+            iso(OutreachDraft.sent_at).label("sent_at"),
+            func.coalesce(OutreachDraft.thread_url, "").label("thread_url"),
+            iso(OutreachDraft.last_response_at).label("last_response_at"),
+            one_line(OutreachDraft.last_response_text).label("last_response_text"),
+        )
+        .join(Creator, OutreachDraft.creator_id == Creator.id)
+    )
 
     if campaign_id:
-        q = q.filter(OutreachDraft.campaign_id == campaign_id)
+        q = q.where(OutreachDraft.campaign_id == campaign_id)
 
     if view == "approved":
-        q = q.filter(OutreachDraft.status == ApprovalStatus.approved).filter(OutreachDraft.outreach_status == OutreachStatus.approved)
+        q = q.where(OutreachDraft.status == ApprovalStatus.approved).where(OutreachDraft.outreach_status == OutreachStatus.approved)
     elif view == "sent":
-        q = q.filter(OutreachDraft.outreach_status == OutreachStatus.sent)
+        q = q.where(OutreachDraft.outreach_status == OutreachStatus.sent)
     elif view == "replied":
-        q = q.filter(OutreachDraft.outreach_status == OutreachStatus.replied)
+        q = q.where(OutreachDraft.outreach_status == OutreachStatus.replied)
     elif view == "booked":
-        q = q.filter(OutreachDraft.outreach_status == OutreachStatus.booked)
+        q = q.where(OutreachDraft.outreach_status == OutreachStatus.booked)
     elif view == "pending":
-        q = q.filter(OutreachDraft.status == ApprovalStatus.pending)
+        q = q.where(OutreachDraft.status == ApprovalStatus.pending)
+
+    q = q.order_by(OutreachDraft.created_at.desc()).limit(2000)
+
+    # Postgres formats the CSV itself (COPY ... TO STDOUT); we only relay the bytes.
+    # All bound values are ints/enums, so rendering them inline is safe.
+    inner = q.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    copy_sql = f"COPY ({inner}) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+    def stream():
+        # Own connection: the request-scoped session may be closed before the body is sent.
+        with engine.connect() as conn:
+            cursor = conn.connection.cursor()
+            try:
+                with cursor.copy(copy_sql) as copy:
+                    for block in copy:
+                        yield bytes(block)
+            finally:
+                cursor.close()
 
-    rows = q.order_by(OutreachDraft.created_at.desc()).limit(2000).all()
-
-    # CSV
-    import csv
-    from io import StringIO
-
-    buf = StringIO()
-    w = csv.writer(buf)
-    w.writerow([
-        "draft_id", "creator_handle", "platform", "campaign", "approval_status",
-        "outreach_status", "message", "sent_at", "thread_url", "last_response_at", "last_response_text"
-    ])
-
-    for d in rows:
-        handle = d.creator.handle if d.creator else ""
-        platform = d.creator.platform if d.creator else "instagram"
-        w.writerow([
-            d.id,
-            handle,
-            platform,
-            d.campaign_name or "",
-            d.status.value,
-            d.outreach_status.value if d.outreach_status else "",
-            (d.message or "").replace("\n", " ").strip(),
-            d.sent_at.isoformat() if d.sent_at else "",
-            d.thread_url or "",
-            d.last_response_at.isoformat() if d.last_response_at else "",
-            (d.last_response_text or "").replace("\n", " ").strip(),
-        ])
-
-    csv_text = buf.getvalue()
     filename = f"outreach_{(campaign_id or 'all')}_{view}.csv"
 
-    return PlainTextResponse(
-        csv_text,
-        headers={
-            "Content-Type": "text/csv; charset=utf-8",
-            "Content-Disposition": f'attachment; filename="{filename}"',
-        },
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 ### Generate outreach followups
 @app.post("/admin/outreach/followups")
 def admin_generate_followups(
+    background_tasks: BackgroundTasks,
     campaign_id: int = Form(None),
     days: int = Form(3),
     limit: int = Form(25),
     db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
-    celery_client.send_task(
+    background_tasks.add_task(
+        celery_client.send_task,
         BUILD_OUTREACH_FOLLOWUPS_TASK,
         args=[],
         kwargs={"campaign_id": campaign_id, "days": days, "limit": limit},
@@ -1204,36 +1278,15 @@ def record_outreach_response(
 @app.post("/admin/generate-today")
 def generate_today(
     request: Request,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
     user: str = Depends(require_admin),
 ):
-    # Simple click-spam guard: 5 minute cooldown
-    key = "CONTENT_INTEL_LAST_REQUESTED_AT"
-    last = db.get(Setting, key)
-
-    # from datetime import datetime, timedelta
-    now = datetime.utcnow()
-
-    if last:
-        try:
-            last_dt = datetime.fromisoformat(last.value)
-            if now - last_dt < timedelta(minutes=5):
-                # Redirect back with message
-                return RedirectResponse(url="/admin?msg=Please+wait+a+few+minutes+before+generating+again", status_code=303)
-        except Exception:
-            pass
-
-    # record request time
-    if not last:
-        last = Setting(key=key, value=now.isoformat())
-    else:
-        last.value = now.isoformat()
-    last.updated_at = now
-    db.add(last)
-    db.commit()
+    # Simple click-spam guard: 5 minute cooldown (atomic, so double-clicks can't both enqueue)
+    if not redis_client.set(CONTENT_INTEL_COOLDOWN_KEY, "1", nx=True, ex=300):
+        return RedirectResponse(url="/admin?msg=Please+wait+a+few+minutes+before+generating+again", status_code=303)
 
     # enqueue Celery task
-    celery_client.send_task(CONTENT_INTEL_TASK)
+    background_tasks.add_task(celery_client.send_task, CONTENT_INTEL_TASK)
 
     return RedirectResponse(url="/admin?msg=Generating+today%27s+ideas...+refresh+Posts+in+30-90+seconds", status_code=303)
 
@@ -1248,11 +1301,9 @@ def set_kill_switch(
 ):
     key = "KILL_SWITCH"
     val = "true" if enabled else "false"
-    s = db.get(Setting, key) or Setting(key=key, value=val)
-    s.value = val
-    s.updated_at = now_utc()
-    db.add(s)
+    upsert_setting(db, key, val)
     db.commit()
+    invalidate_settings_cache()
     return {"key": key, "value": val, "by": user}
 
 @app.post("/settings/action-mode")
@@ -1263,11 +1314,9 @@ def set_action_mode(
     user: str = Depends(require_admin),
 ):
     key = "ACTION_MODE"
-    s = db.get(Setting, key) or Setting(key=key, value=mode.value)
-    s.value = mode.value
-    s.updated_at = now_utc()
-    db.add(s)
+    upsert_setting(db, key, mode.value)
     db.commit()
+    invalidate_settings_cache()
     return {"key": key, "value": mode.value, "by": user}
 
 @app.get("/settings")
@@ -1276,8 +1325,7 @@ def get_settings(
     db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
-    items = db.query(Setting).all()
-    return {"by": user, "settings": {i.key: i.value for i in items}}
+    return {"by": user, "settings": load_settings_map(db)}
 
 # Keep the rest of your endpoints the same, but add:
 # request: Request as first arg and user: str = Depends(require_admin)
@@ -1300,14 +1348,14 @@ def upsert_plan(
     db: Session = Depends(get_db),
     _: None = Depends(require_admin),
 ):
-    plan = db.query(DailyPlan).filter(DailyPlan.plan_date == plan_date).first()
-    if not plan:
-        plan = DailyPlan(plan_date=plan_date, summary=summary)
-    else:
-        plan.summary = summary
-    db.add(plan)
+    stmt = pg_insert(DailyPlan).values(plan_date=plan_date, summary=summary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyPlan.plan_date],
+        set_={"summary": stmt.excluded.summary},
+    ).returning(DailyPlan.id)
+    plan_id = db.execute(stmt).scalar_one()
     db.commit()
-    return {"id": plan.id, "plan_date": plan.plan_date}
+    return {"id": plan_id, "plan_date": plan_date}
 
 # ---- Post drafts ----
 
@@ -1318,8 +1366,15 @@ def list_post_drafts(
     db: Session = Depends(get_db),
     _: None = Depends(require_admin),
 ):
-    q = db.query(PostDraft).filter(PostDraft.status == status).order_by(PostDraft.created_at.desc())
-    items = q.limit(limit).all()
+    items = db.execute(
+        select(
+            PostDraft.id, PostDraft.content_type, PostDraft.hook, PostDraft.caption,
+            PostDraft.hashtags, PostDraft.media_notes, PostDraft.status, PostDraft.created_at,
+        )
+        .where(PostDraft.status == status)
+        .order_by(PostDraft.created_at.desc())
+        .limit(limit)
+    ).all()
     return [{
         "id": p.id,
         "type": p.content_type.value,
@@ -1470,6 +1525,7 @@ def admin_queue(
 @app.post("/posts/{post_id}/shoot-pack")
 def trigger_shoot_pack(
     post_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
@@ -1480,7 +1536,8 @@ def trigger_shoot_pack(
     # enqueue task
     # build_shoot_pack.delay(post_id)
     # enqueue Celery task
-    celery_client.send_task(
+    background_tasks.add_task(
+        celery_client.send_task,
         BUILD_SHOOT_PACK_TASK,   # "tasks.build_shoot_pack"
         args=[post_id],
     )
@@ -1492,6 +1549,7 @@ def trigger_shoot_pack(
 @app.post("/posts/{post_id}/broll-pack")
 def trigger_broll_pack(
     post_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user: str = Depends(require_admin),
 ):
@@ -1499,7 +1557,7 @@ def trigger_broll_pack(
     if not pd:
         raise HTTPException(status_code=404, detail="PostDraft not found")
 
-    celery_client.send_task(BUILD_BROLL_PACK_TASK, args=[post_id])
+    background_tasks.add_task(celery_client.send_task, BUILD_BROLL_PACK_TASK, args=[post_id])
     return RedirectResponse(url="/admin/queue", status_code=303)
 
 ### Schedule post (just sets schedule_for field)
@@ -1557,8 +1615,16 @@ def list_engagement_queue(
     db: Session = Depends(get_db),
     _: None = Depends(require_admin),
 ):
-    q = db.query(EngagementQueueItem).filter(EngagementQueueItem.status == status).order_by(EngagementQueueItem.created_at.desc())
-    items = q.limit(limit).all()
+    items = db.execute(
+        select(
+            EngagementQueueItem.id, EngagementQueueItem.target_handle, EngagementQueueItem.target_url,
+            EngagementQueueItem.action_like, EngagementQueueItem.action_comment,
+            EngagementQueueItem.suggested_comment, EngagementQueueItem.status, EngagementQueueItem.created_at,
+        )
+        .where(EngagementQueueItem.status == status)
+        .order_by(EngagementQueueItem.created_at.desc())
+        .limit(limit)
+    ).all()
     return [{
         "id": i.id,
         "target_handle": i.target_handle,
@@ -1604,11 +1670,19 @@ def list_outreach_queue(
     db: Session = Depends(get_db),
     _: None = Depends(require_admin),
 ):
-    q = db.query(OutreachDraft).filter(OutreachDraft.status == status).order_by(OutreachDraft.created_at.desc())
-    items = q.limit(limit).all()
+    items = db.execute(
+        select(
+            OutreachDraft.id, Creator.handle, OutreachDraft.message, OutreachDraft.offer_type,
+            OutreachDraft.campaign_name, OutreachDraft.status, OutreachDraft.created_at,
+        )
+        .outerjoin(Creator, OutreachDraft.creator_id == Creator.id)
+        .where(OutreachDraft.status == status)
+        .order_by(OutreachDraft.created_at.desc())
+        .limit(limit)
+    ).all()
     return [{
         "id": o.id,
-        "creator_handle": o.creator.handle if o.creator else None,
+        "creator_handle": o.handle,
         "message": o.message,
         "offer_type": o.offer_type,
         "campaign_name": o.campaign_name,
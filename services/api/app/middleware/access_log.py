@@ -1,23 +1,45 @@
+import logging
+import os
 import time
 import structlog
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-log = structlog.get_logger("access")
+# Set ACCESS_LOG_LEVEL=WARNING to silence per-request lines. The filtering wrapper turns
+# log.info into a no-op, and the middleware skips its timing/send wrapper entirely.
+ACCESS_LOG_LEVEL = getattr(logging, os.getenv("ACCESS_LOG_LEVEL", "INFO").upper(), logging.INFO)
+ACCESS_LOG_ENABLED = ACCESS_LOG_LEVEL <= logging.INFO
+
+log = structlog.wrap_logger(
+    None,
+    wrapper_class=structlog.make_filtering_bound_logger(ACCESS_LOG_LEVEL),
+    logger_factory_args=("access",),
+)
+
+class AccessLogMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not ACCESS_LOG_ENABLED:
+            return await self.app(scope, receive, send)
+
+        start = time.monotonic_ns()
+        status_code = 500
+
+        async def send_capturing_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-class AccessLogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start = time.perf_counter()
-        response = None
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_capturing_status)
         finally:
-            dur_ms = int((time.perf_counter() - start) * 1000)
+            dur_ms = (time.monotonic_ns() - start) // 1_000_000
             log.info(
                 "http_request",
-                method=request.method,
-                path=request.url.path,
-                status_code=getattr(response, "status_code", 500),
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
                 duration_ms=dur_ms,
             )
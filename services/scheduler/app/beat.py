@@ -6,28 +6,21 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
 celery = Celery("h2n_beat", broker=REDIS_URL)
 celery.conf.timezone = "America/Chicago"
+celery.conf.task_serializer = "msgpack"  # matches the worker's accept_content
 
-celery.conf.beat_schedule = {
-    "content-intel-daily": {
-        "task": "tasks.content_intel_daily",
-        "schedule": crontab(hour=7, minute=15),
-    },
-    "engagement-queue-daily": {
-        "task": "tasks.engagement_queue_daily",
-        "schedule": crontab(hour=9, minute=10),
-    },
-    "creator-discovery": {
-        "task": "tasks.creator_discovery_hashtags",
-        "schedule": crontab(minute=0, hour="*/6"),
-        "args": (200, 4),
-    },
-    "creator-related-expansion": {
-        "task": "tasks.creator_discovery_hashtags",
-        "schedule": crontab(minute=30, hour="*/12"),
-        "args": (200, 4),
-    },
-    "creator-intel": {
-        "task": "tasks.creator_intel_daily",
-        "schedule": crontab(minute=0, hour=3),
-    },
+# (name, task, schedule, args)
+# creator_discovery_hashtags already runs related-handle expansion after the hashtag
+# pass (targeting.yaml: enable_related_expansion), so it is scheduled exactly once.
+SCHEDULE = (
+    ("content-intel-daily", "tasks.content_intel_daily", crontab(hour=7, minute=15), ()),
+    ("engagement-queue-daily", "tasks.engagement_queue_daily", crontab(hour=9, minute=10), ()),
+    ("creator-discovery", "tasks.creator_discovery_hashtags", crontab(minute=0, hour="*/6"), (200, 4)),
+    ("creator-intel", "tasks.creator_intel_daily", crontab(minute=0, hour=3), ()),
+)
+
+BEAT_SCHEDULE = {
+    name: {"task": task, "schedule": schedule, "args": args}
+    for name, task, schedule, args in SCHEDULE
 }
+
+celery.conf.beat_schedule = BEAT_SCHEDULE
@@ -0,0 +1,60 @@
+"""Per-process background event loop for sync (Celery) callers.
+
+Async helpers here (the shared Playwright browser, pooled httpx clients) are bound to the
+loop they were created on, so sync code submits its coroutines to one long-lived loop
+instead of spinning up a fresh one with asyncio.run() per call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_BG_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_BG_PID: Optional[int] = None
+_bg_lock = threading.Lock()
+
+
+def bg_loop() -> asyncio.AbstractEventLoop:
+    """This process's background loop, started on first use."""
+    global _BG_LOOP, _BG_PID
+    with _bg_lock:
+        # a loop thread started before a prefork fork does not exist in the child
+        if _BG_LOOP is None or _BG_PID != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="bg-event-loop", daemon=True).start()
+            _BG_LOOP, _BG_PID = loop, os.getpid()
+        return _BG_LOOP
+
+
+def bg_loop_running() -> bool:
+    return _BG_LOOP is not None and _BG_PID == os.getpid()
+
+
+def run_async(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine on this process's background loop and block for its result.
+
+    The loop is shared by every task in the process, so coroutines sent here should only
+    await I/O; blocking DB or CPU work belongs in the calling thread. On timeout the
+    coroutine is cancelled rather than left running on the loop.
+    """
+    fut = asyncio.run_coroutine_threadsafe(coro, bg_loop())
+    try:
+        return fut.result(timeout)
+    except TimeoutError:
+        fut.cancel()
+        raise
+
+
+def stop_bg_loop() -> None:
+    global _BG_LOOP
+    with _bg_lock:
+        if _BG_LOOP is None or _BG_PID != os.getpid():
+            return
+        _BG_LOOP.call_soon_threadsafe(_BG_LOOP.stop)
+        _BG_LOOP = None
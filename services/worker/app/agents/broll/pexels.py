@@ -1,15 +1,29 @@
 import os
-import json
+import asyncio
+import hashlib
 import pathlib
-import requests
+import weakref
+import httpx
+import orjson
+import redis
 from typing import Any, Dict, List, Optional, Tuple
 
+from agents.aio import run_async
+
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
 PEXELS_BASE = "https://api.pexels.com"
 ORIENTATION = os.getenv("PEXELS_ORIENTATION", "portrait")
 PER_QUERY = int(os.getenv("PEXELS_PER_QUERY", "4"))
 DOWNLOAD = os.getenv("PEXELS_DOWNLOAD", "1") == "1"
 ASSETS_DIR = os.getenv("ASSETS_DIR", "/assets")
+# searches and clip downloads in flight at once
+CONCURRENCY = int(os.getenv("PEXELS_CONCURRENCY", "6"))
+
+# Clips found (and downloaded) for a keyword are shared across drafts via Redis, so a
+# keyword that shows up again within the TTL costs no Pexels quota or bandwidth.
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CACHE_TTL_SECONDS = int(os.getenv("PEXELS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+_redis = redis.Redis.from_url(REDIS_URL)
 
 class PexelsError(RuntimeError):
     pass
@@ -20,10 +34,25 @@ def _headers() -> Dict[str, str]:
     # Pexels wants raw key in Authorization (no Bearer).  :contentReference[oaicite:2]{index=2}
     return {"Authorization": PEXELS_API_KEY}
 
-def search_videos(query: str, per_page: int = PER_QUERY) -> Dict[str, Any]:
+# httpx pools are bound to the loop they were first used on
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=30.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+        )
+        _clients[loop] = client
+    return client
+
+async def search_videos(query: str, per_page: int = PER_QUERY) -> Dict[str, Any]:
     url = f"{PEXELS_BASE}/videos/search"
     params = {"query": query, "per_page": per_page, "orientation": ORIENTATION}
-    r = requests.get(url, headers=_headers(), params=params, timeout=30)
+    r = await _client().get(url, headers=_headers(), params=params, timeout=30)
     r.raise_for_status()
     return r.json()
 
@@ -46,16 +75,74 @@ def _pick_best_file(video: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 
     return sorted(files, key=score, reverse=True)[0]
 
-def download_file(url: str, out_path: str) -> None:
+async def download_file(url: str, out_path: str) -> None:
     pathlib.Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-    with requests.get(url, stream=True, timeout=120) as r:
+    async with _client().stream("GET", url) as r:
         r.raise_for_status()
         with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
-
-def get_broll_for_keywords(post_id: int, keywords: List[str]) -> Dict[str, Any]:
+            async for chunk in r.aiter_bytes(1024 * 1024):
+                # disk writes go to a thread so other downloads keep streaming
+                await asyncio.to_thread(f.write, chunk)
+
+Clip = Dict[str, Any]
+
+def _cache_key(kw: str) -> str:
+    raw = f"{kw.lower()}|{ORIENTATION}|{PER_QUERY}|{int(DOWNLOAD)}".encode("utf-8")
+    return "broll:" + hashlib.sha256(raw).hexdigest()
+
+def _usable(clips: List[Clip]) -> bool:
+    # a cached fragment whose files were cleaned up has to be fetched again
+    return all(not c.get("local_path") or os.path.exists(c["local_path"]) for c in clips)
+
+def _cache_get_many(keywords: List[str]) -> Dict[str, List[Clip]]:
+    """Cached clip lists for the keywords that have a usable entry (one MGET)."""
+    if not keywords:
+        return {}
+    try:
+        blobs = _redis.mget([_cache_key(kw) for kw in keywords])
+    except redis.RedisError:
+        return {}
+    out: Dict[str, List[Clip]] = {}
+    for kw, blob in zip(keywords, blobs):
+        if blob is None:
+            continue
+        clips = orjson.loads(blob)
+        if _usable(clips):
+            out[kw] = clips
+    return out
+
+def _cache_put_many(fragments: Dict[str, List[Clip]]) -> None:
+    if not fragments:
+        return
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for kw, clips in fragments.items():
+            pipe.setex(_cache_key(kw), CACHE_TTL_SECONDS, orjson.dumps(clips))
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+def _reuse(clip: Clip, out_dir: str) -> Clip:
+    """A cached clip for this draft: its file is hard-linked into out_dir when possible."""
+    src = clip.get("local_path")
+    if not src:
+        return dict(clip)
+    dst = f"{out_dir}/{os.path.basename(src)}"
+    if dst != src:
+        try:
+            pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+            os.link(src, dst)
+        except FileExistsError:
+            pass
+        except OSError:
+            dst = src  # different filesystem etc.: point at the shared copy
+    return {**clip, "local_path": dst}
+
+async def aget_broll_for_keywords(
+    post_id: int,
+    keywords: List[str],
+    cached: Optional[Dict[str, List[Clip]]] = None,
+) -> Dict[str, Any]:
     """
     Returns a manifest:
     {
@@ -67,12 +154,30 @@ def get_broll_for_keywords(post_id: int, keywords: List[str]) -> Dict[str, Any]:
       ],
       "attribution": [...]
     }
+    Keyword searches run concurrently, then every clip downloads concurrently (at most
+    CONCURRENCY requests in flight); clip order is the same as a sequential run.
+    Keywords present in `cached` reuse those clips and make no requests.
     """
-    clips: List[Dict[str, Any]] = []
+    cached = cached or {}
+    misses = [kw for kw in keywords if kw not in cached]
+    if misses:
+        _headers()  # fail fast on a missing key, before any request is scheduled
+    by_kw: Dict[str, List[Clip]] = {kw: [] for kw in keywords}
     out_dir = f"{ASSETS_DIR}/broll/{post_id}"
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def _search(kw: str) -> Dict[str, Any]:
+        async with sem:
+            return await search_videos(kw, per_page=PER_QUERY)
+
+    async def _download(url: str, path: str) -> None:
+        async with sem:
+            await download_file(url, path)
+
+    results = await asyncio.gather(*(_search(kw) for kw in misses))
 
-    for kw in keywords:
-        data = search_videos(kw, per_page=PER_QUERY)
+    downloads = []
+    for kw, data in zip(misses, results):
         for v in data.get("videos", [])[:PER_QUERY]:
             best = _pick_best_file(v)
             if not best:
@@ -99,10 +204,17 @@ def get_broll_for_keywords(post_id: int, keywords: List[str]) -> Dict[str, Any]:
 
             if DOWNLOAD and file_url:
                 local_path = f"{out_dir}/{kw.replace(' ', '_')}_{v.get('id')}.mp4"
-                download_file(file_url, local_path)
+                downloads.append(_download(file_url, local_path))
                 item["local_path"] = local_path
 
-            clips.append(item)
+            by_kw[kw].append(item)
+
+    await asyncio.gather(*downloads)
+
+    for kw, hit in cached.items():
+        if kw in by_kw:
+            by_kw[kw] = [_reuse(c, out_dir) for c in hit]
+    clips = [c for kw in keywords for c in by_kw[kw]]
 
     attribution = []
     for c in clips:
@@ -115,3 +227,19 @@ def get_broll_for_keywords(post_id: int, keywords: List[str]) -> Dict[str, Any]:
         "out_dir": out_dir if DOWNLOAD else None,
         "attribution": attribution,
     }
+
+def get_broll_for_keywords(post_id: int, keywords: List[str]) -> Dict[str, Any]:
+    """
+    Sync entry point for aget_broll_for_keywords() (runs on the process's background loop).
+    Duplicate keywords are dropped; cached keywords are served from Redis and only the
+    misses go to Pexels, after which their clips are cached for the next draft.
+    """
+    keywords = list(dict.fromkeys(keywords))
+    cached = _cache_get_many(keywords)
+    manifest = run_async(aget_broll_for_keywords(post_id, keywords, cached))
+    _cache_put_many({
+        kw: [c for c in manifest["clips"] if c["query"] == kw]
+        for kw in keywords
+        if kw not in cached
+    })
+    return manifest
@@ -1,10 +1,11 @@
-import os
-
 import json
+import os
 import re
 
-from datetime import date
-from typing import Any, Dict, List, Optional
+import msgspec
+import orjson
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from agents.llm import think, draft
 
 BRAND_SYSTEM = """You are a content strategist for Hello To Natural, a faith-friendly natural wellness brand.
@@ -15,14 +16,67 @@ Keep Reels: 12–25 seconds.
 Always include a clear CTA: Save / Share / Comment keyword.
 """
 
-def build_daily_plan(signals: Dict) -> str:
-    prompt = f"""
+# Static part of the reel-ideas prompt. Kept byte-identical across calls (only the
+# signals and n go in the user prompt) so the model server can reuse the prefix.
+REEL_IDEAS_SYSTEM = BRAND_SYSTEM + """
+You are generating Instagram Reel ideas for the brand Hello To Natural (H2N).
+Use the trend signals you are given as inspiration, but keep it brand-safe and realistic.
+
+Requirements:
+- Generate exactly the number of ideas requested.
+- Each idea must be UNIQUE.
+- Content must be safe and avoid medical claims.
+- Make them practical, engaging, and aligned with H2N body care / self-care vibe.
+- Tone: fun, sexy, playful, confident, but tasteful.
+
+JSON OUTPUT CONTRACT (strict):
+Return ONLY valid JSON.
+No markdown, no code fences, no commentary.
+Output must be a JSON array of objects, each with EXACT keys:
+- hook (string)
+- concept (string)
+- script_outline (string)
+- broll (array of strings)
+- caption (string)
+- hashtags (array of strings)
+"""
+
+# Same brief as REEL_IDEAS_SYSTEM plus the daily plan, answered as one JSON object.
+PLAN_AND_IDEAS_SYSTEM = BRAND_SYSTEM + """
+You plan today's content for the brand Hello To Natural (H2N) and generate Instagram Reel ideas.
+Use the trend signals you are given as inspiration, but keep it brand-safe and realistic.
+
+The daily plan is short plain text with:
+1) Today's themes (2-3 themes that are trending today and how Hello To Natural can respond)
+2) 1 Reel format recommendation (face-forward, b-roll, text-over)
+3) 1 CTA recommendation
+4) A reminder of safety (no medical claims)
+
+Reel idea requirements:
+- Generate exactly the number of ideas requested.
+- Each idea must be UNIQUE.
+- Content must be safe and avoid medical claims.
+- Make them practical, engaging, and aligned with H2N body care / self-care vibe.
+- Tone: fun, sexy, playful, confident, but tasteful.
+
+JSON OUTPUT CONTRACT (strict):
+Return ONLY valid JSON.
+No markdown, no code fences, no commentary.
+Output must be a single JSON object with EXACT keys:
+- plan (string)
+- ideas (array of objects, each with EXACT keys:
+  hook (string), concept (string), script_outline (string),
+  broll (array of strings), caption (string), hashtags (array of strings))
+"""
+
+# Per-call (user turn) templates; the static instructions live in the *_SYSTEM strings above.
+_DAILY_PLAN_TEMPLATE = """
 Using the signals below, identify 2-3 themes that are trending today and how Hello To Natural can respond.
 
 Signals (summarized):
-- Google Trends: {signals.get("trends", [])[:10]}
-- YouTube topics: {signals.get("youtube", [])[:10]}
-- Reddit topics: {signals.get("reddit", [])[:10]}
+- Google Trends: {trends}
+- YouTube topics: {youtube}
+- Reddit topics: {reddit}
 
 Output a short daily plan with:
 1) Today's themes
@@ -30,8 +84,195 @@ Output a short daily plan with:
 3) 1 CTA recommendation
 4) A reminder of safety (no medical claims)
 """
+
+_REEL_IDEAS_TEMPLATE = """
+Trend Signals (summarized):
+{signals_json}
+
+Generate exactly {n} ideas.
+"""
+
+_FENCE_OPEN = re.compile(r"^```(?:json)?\s*", re.IGNORECASE)
+_FENCE_CLOSE = re.compile(r"\s*```$")
+_HASHTAG_SPLIT = re.compile(r"[\s,]+")
+_NON_WORD = re.compile(r"\W+")
+
+# ---------- JSON parsing helpers ----------
+
+def _strip_fences(s: str) -> str:
+    s = s.strip()
+    # Remove ```json ... ``` or ``` ... ```
+    s = _FENCE_OPEN.sub("", s)
+    s = _FENCE_CLOSE.sub("", s)
+    return s.strip()
+
+def _extract_json_blob(s: str) -> str:
+    s = _strip_fences(s)
+
+    # First complete top-level array/object; ignores any chatter before or after it.
+    span = _find_json_span(s)
+    if span:
+        return s[span[0]:span[1]]
+
+    # Unbalanced (e.g. truncated) JSON: hand it over as-is and let the parser/repair decide.
+    if s.startswith("{") or s.startswith("["):
+        return s
+
+    return ""  # nothing usable
+
+def _find_json_span(s: str) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) of the first balanced [...] or {...} in s.
+    Brackets inside quoted strings are ignored; returns None if nothing balances.
+    """
+    start = -1
+    for i, ch in enumerate(s):
+        if ch == "[" or ch == "{":
+            start = i
+            break
+    if start < 0:
+        return None
+
+    depth = 0
+    quote = None
+    escaped = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+            continue
+        if ch == '"' or ch == "'":
+            quote = ch
+        elif ch == "[" or ch == "{":
+            depth += 1
+        elif ch == "]" or ch == "}":
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def _heuristic_repair(blob: str) -> str:
+    """
+    Cheap fixes for the usual almost-JSON model output, applied outside of strings only:
+    surrounding prose/fences, single-quoted strings, True/False/None and trailing commas.
+    """
+    s = _strip_fences(blob)
+    span = _find_json_span(s)
+    if span:
+        s = s[span[0]:span[1]]
+    else:
+        start = min((i for i in (s.find("["), s.find("{")) if i >= 0), default=-1)
+        if start < 0:
+            return ""
+        s = s[start:]
+
+    out: List[str] = []
+    i, n = 0, len(s)
+    while i < n:
+        ch = s[i]
+
+        if ch == '"' or ch == "'":
+            # copy the string, re-quoting single-quoted ones with double quotes
+            j = i + 1
+            buf: List[str] = []
+            while j < n and s[j] != ch:
+                if s[j] == "\\" and j + 1 < n:
+                    buf.append("'" if s[j + 1] == "'" else s[j:j + 2])
+                    j += 2
+                    continue
+                buf.append('\\"' if (ch == "'" and s[j] == '"') else s[j])
+                j += 1
+            out.append('"' + "".join(buf) + '"')
+            i = j + 1
+            continue
+
+        if ch == ",":
+            j = i + 1
+            while j < n and s[j].isspace():
+                j += 1
+            if j < n and (s[j] == "]" or s[j] == "}"):
+                i += 1
+                continue
+
+        if ch.isalpha():
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            out.append(_PY_LITERALS.get(word, word))
+            i = j
+            continue
+
+        out.append(ch)
+        i += 1
+
+    return "".join(out)
+
+def _safe_json_load(raw: str):
+    blob = _extract_json_blob(raw)
+    if blob:
+        try:
+            return orjson.loads(blob)
+        except orjson.JSONDecodeError:
+            pass
+
+    # Fix the common breakages locally before the caller falls back to an LLM repair call.
+    # (stdlib json here: strict=False tolerates raw newlines inside strings, orjson doesn't)
+    repaired = _heuristic_repair(raw)
+    if not repaired:
+        raise ValueError("No JSON found in model output")
+    return json.loads(repaired, strict=False)
+
+# ---------- prompt inputs ----------
+
+def _compact_signals(signals: Dict[str, Any], per_source: int = 10) -> str:
+    """
+    Signals as compact JSON for the prompt: just the title text per source,
+    near-duplicates (case/punctuation) removed, at most per_source each.
+    """
+    out: Dict[str, List[str]] = {}
+    for source, items in signals.items():
+        seen = set()
+        kept: List[str] = []
+        for it in items or []:
+            text = (it.get("title") or it.get("trend")) if isinstance(it, dict) else it
+            text = str(text or "").strip()
+            if len(text) < 4:
+                continue
+            key = _NON_WORD.sub(" ", text.lower()).strip()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(text)
+            if len(kept) >= per_source:
+                break
+        out[source] = kept
+    return orjson.dumps(out).decode()
+
+def build_daily_plan(signals: Dict) -> str:
+    prompt = _DAILY_PLAN_TEMPLATE.format(
+        trends=signals.get("trends", [])[:10],
+        youtube=signals.get("youtube", [])[:10],
+        reddit=signals.get("reddit", [])[:10],
+    )
     return think(prompt, system=BRAND_SYSTEM, temperature=0.3)
 
+class Idea(msgspec.Struct):
+    """One reel idea as the JSON contract describes it (unknown keys are ignored)."""
+    hook: str = ""
+    concept: str = ""
+    script_outline: str = ""
+    broll: List[str] = []
+    caption: str = ""
+    hashtags: List[str] = []
+
 def _normalize_ideas(items: Any, n: int) -> List[Dict[str, Any]]:
     """
     Guarantees a list of dicts with keys we expect.
@@ -40,6 +281,27 @@ def _normalize_ideas(items: Any, n: int) -> List[Dict[str, Any]]:
     if not isinstance(items, list):
         return []
 
+    # Fast path: well-formed output validates straight into typed structs (in C).
+    try:
+        typed = msgspec.convert(items[:n], type=List[Idea])
+    except msgspec.ValidationError:
+        typed = None
+    if typed is not None:
+        out = []
+        for i in typed:
+            idea = {
+                "hook": i.hook.strip(),
+                "concept": i.concept.strip(),
+                "script_outline": i.script_outline.strip(),
+                "broll": i.broll,
+                "caption": i.caption.strip(),
+                "hashtags": i.hashtags,
+            }
+            if idea["hook"] and idea["concept"]:
+                out.append(idea)
+        return out
+
+    # Slow path: coerce loosely-typed fields one by one.
     out: List[Dict[str, Any]] = []
     for it in items[:n]:
         if not isinstance(it, dict):
@@ -54,7 +316,7 @@ def _normalize_ideas(items: Any, n: int) -> List[Dict[str, Any]]:
         hashtags = it.get("hashtags", [])
         if isinstance(hashtags, str):
             # allow "#a #b" or "a,b"
-            hashtags = re.split(r"[\s,]+", hashtags.strip())
+            hashtags = _HASHTAG_SPLIT.split(hashtags.strip())
             hashtags = [h for h in hashtags if h]
         if not isinstance(hashtags, list):
             hashtags = []
@@ -74,68 +336,8 @@ def _normalize_ideas(items: Any, n: int) -> List[Dict[str, Any]]:
 
     return out
 
-# ---------- main function ----------
-
-def generate_reel_ideas(signals: Dict[str, Any], n: int = 5) -> List[Dict[str, Any]]:
-    """
-    Returns a list of n reel ideas as strict JSON (with repair pass + normalization).
-    """
-
-    prompt = f"""
-You are generating Instagram Reel ideas for the brand Hello To Natural (H2N).
-Use the trend signals below as inspiration, but keep it brand-safe and realistic.
-
-Trend Signals (summarized):
-{json.dumps(signals, indent=2)[:8000]}
-
-Requirements:
-- Generate exactly {n} ideas.
-- Each idea must be UNIQUE.
-- Content must be safe and avoid medical claims.
-- Make them practical, engaging, and aligned with H2N body care / self-care vibe.
-- Tone: fun, sexy, playful, confident, but tasteful.
-
-JSON OUTPUT CONTRACT (strict):
-Return ONLY valid JSON.
-No markdown, no code fences, no commentary.
-Output must be a JSON array of {n} objects, each with EXACT keys:
-- hook (string)
-- concept (string)
-- script_outline (string)
-- broll (array of strings)
-- caption (string)
-- hashtags (array of strings)
-"""
-
-    raw = draft(prompt, system=BRAND_SYSTEM, temperature=0.6)
-
-    # Helpful debug if it fails in logs
-    if not raw or not raw.strip():
-        # Try one repair immediately
-        raw = draft(
-            f"Return ONLY valid JSON per the contract. Generate {n} ideas now.",
-            system=BRAND_SYSTEM,
-            temperature=0.2,
-        )
-
-    try:
-        parsed = _safe_json_load(raw)
-    except Exception:
-        # Repair pass: ask model to convert its own output into valid JSON only
-        repair_prompt = f"""
-You returned invalid JSON.
-
-Fix it and return ONLY valid JSON (no markdown, no commentary).
-It must be a JSON array of {n} objects with EXACT keys:
-hook, concept, script_outline, broll, caption, hashtags.
-
-Here is your previous output:
-{raw}
-"""
-        fixed = draft(repair_prompt, system=BRAND_SYSTEM, temperature=0.2)
-        parsed = _safe_json_load(fixed)
-
-    ideas = _normalize_ideas(parsed, n=n)
+def _complete_ideas(items: Any, n: int) -> List[Dict[str, Any]]:
+    ideas = _normalize_ideas(items, n=n)
 
     # Last resort fallback: if model gave parsed JSON but empty/invalid structure
     if len(ideas) < n:
@@ -155,30 +357,100 @@ Here is your previous output:
 
     return ideas
 
+def _draft_json(
+    prompt: str,
+    system: str,
+    contract: str,
+    retry_prompt: Optional[str] = None,
+    *,
+    generate: Callable[..., str] = draft,
+    temperature: float = 0.6,
+    cache: bool = True,
+) -> Any:
+    """
+    generate() (draft by default) and parse the reply as JSON. An empty reply is retried
+    once (if retry_prompt), and output that local repair can't fix gets one LLM repair pass
+    described by contract. Retry and repair use the same generate(). cache=False keeps the
+    first reply out of the response cache (see agents.llm_cache).
+    """
+    raw = generate(prompt, system=system, temperature=temperature, cache=cache)
 
-def _strip_fences(s: str) -> str:
-    s = s.strip()
-    # Remove ```json ... ``` or ``` ... ```
-    s = re.sub(r"^```(?:json)?\s*", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s*```$", "", s)
-    return s.strip()
+    if retry_prompt and (not raw or not raw.strip()):
+        # the retry prompt carries no signals, so a cached reply would replay stale ideas
+        raw = generate(retry_prompt, system=system, temperature=0.2, cache=False)
 
-def _extract_json_blob(s: str) -> str:
-    s = _strip_fences(s)
+    try:
+        return _safe_json_load(raw)
+    except Exception:
+        # Repair pass: ask model to convert its own output into valid JSON only
+        repair_prompt = f"""
+You returned invalid JSON.
 
-    # If it's already pure JSON, great.
-    if s.startswith("{") or s.startswith("["):
-        return s
+Fix it and return ONLY valid JSON (no markdown, no commentary).
+{contract}
 
-    # Try to find the first JSON array or object in the text
-    m = re.search(r"(\[.*\]|\{.*\})", s, flags=re.DOTALL)
-    if m:
-        return m.group(1).strip()
+Here is your previous output:
+{raw}
+"""
+        return _safe_json_load(generate(repair_prompt, system=system, temperature=0.2))
 
-    return ""  # nothing usable
+# ---------- main functions ----------
+
+def generate_reel_ideas(signals: Dict[str, Any], n: int = 5) -> List[Dict[str, Any]]:
+    """
+    Returns a list of n reel ideas as strict JSON (with repair pass + normalization).
+    """
+
+    prompt = _REEL_IDEAS_TEMPLATE.format(signals_json=_compact_signals(signals), n=n)
+
+    parsed = _draft_json(
+        prompt,
+        system=REEL_IDEAS_SYSTEM,
+        contract=f"It must be a JSON array of {n} objects with EXACT keys:\nhook, concept, script_outline, broll, caption, hashtags.",
+        retry_prompt=f"Return ONLY valid JSON per the contract. Generate {n} ideas now.",
+    )
+
+    return _complete_ideas(parsed, n)
+
+# One call writes both the plan (0.3 in build_daily_plan) and the ideas (0.6 in
+# generate_reel_ideas); defaults to the plan's temperature.
+PLAN_AND_IDEAS_TEMPERATURE = float(os.getenv("PLAN_AND_IDEAS_TEMPERATURE", "0.3"))
+
+def build_plan_and_ideas(signals: Dict[str, Any], n: int = 5) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Daily plan text + n reel ideas from a single LLM call over the same signals. The call
+    goes through think() (main model, PLAN_AND_IDEAS_TEMPERATURE) like build_daily_plan did,
+    so the plan quality is unchanged, and always bypasses the response cache. Falls back to build_daily_plan only if the model leaves the
+    plan out.
+    """
+    prompt = _REEL_IDEAS_TEMPLATE.format(signals_json=_compact_signals(signals), n=n)
+
+    parsed = _draft_json(
+        prompt,
+        system=PLAN_AND_IDEAS_SYSTEM,
+        contract=(
+            f"It must be a JSON object with EXACT keys: plan (string), ideas (array of {n} objects with EXACT keys:\n"
+            "hook, concept, script_outline, broll, caption, hashtags)."
+        ),
+        retry_prompt=f"Return ONLY valid JSON per the contract. Write the plan and {n} ideas now.",
+        # the plan used to come from build_daily_plan: keep its model and temperature
+        generate=think,
+        temperature=PLAN_AND_IDEAS_TEMPERATURE,
+        # 0.3 is within the cache's temperature range; a rerun over the same signals must
+        # still produce fresh drafts, not replay (and re-insert) yesterday's
+        cache=False,
+    )
+
+    if isinstance(parsed, dict):
+        plan = parsed.get("plan")
+        items = parsed.get("ideas")
+    else:
+        # model skipped the wrapper object and returned just the ideas array
+        plan, items = None, parsed
+
+    if isinstance(plan, (dict, list)):
+        plan = orjson.dumps(plan).decode()
+    plan_text = str(plan or "").strip() or build_daily_plan(signals)
+
+    return plan_text, _complete_ideas(items, n)
 
-def _safe_json_load(raw: str):
-    blob = _extract_json_blob(raw)
-    if not blob:
-        raise ValueError("No JSON found in model output")
-    return json.loads(blob)
@@ -1,33 +1,45 @@
-from bs4 import BeautifulSoup
+from io import BytesIO
+from lxml import etree
+from selectolax.parser import HTMLParser
 from typing import List, Dict
 
 def parse_google_trends_rss(xml_text: str) -> List[Dict]:
-    # RSS is XML; BeautifulSoup handles it.
-    soup = BeautifulSoup(xml_text, "xml")
+    # Stream the feed and stop after 20 items; each <item> is freed once read.
     items = []
-    for item in soup.find_all("item")[:20]:
-        title = (item.title.text or "").strip()
-        traffic = (item.find("ht:approx_traffic").text if item.find("ht:approx_traffic") else "").strip()
-        items.append({"trend": title, "traffic": traffic})
+    try:
+        for _, item in etree.iterparse(BytesIO(xml_text.encode("utf-8")), tag="item", recover=True):
+            title = (item.findtext("title") or "").strip()
+            traffic = ""
+            for child in item:
+                # <ht:approx_traffic>; match on local name so a namespace URI change doesn't matter
+                if isinstance(child.tag, str) and child.tag.endswith("}approx_traffic"):
+                    traffic = (child.text or "").strip()
+                    break
+            items.append({"trend": title, "traffic": traffic})
+            item.clear()
+            if len(items) >= 20:
+                break
+    except etree.XMLSyntaxError:
+        pass
     return items
 
 def parse_youtube_results(html: str) -> List[Dict]:
     # YouTube is JS-heavy; this will be imperfect.
     # We use title tags as a rough signal (still helpful).
-    soup = BeautifulSoup(html, "html.parser")
+    tree = HTMLParser(html)
     titles = []
-    for a in soup.select("a#video-title")[:20]:
-        t = (a.get("title") or "").strip()
+    for a in tree.css("a#video-title")[:20]:
+        t = (a.attributes.get("title") or "").strip()
         if t:
             titles.append({"title": t})
     return titles
 
 def parse_reddit_titles(html: str) -> List[Dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    tree = HTMLParser(html)
     # Modern Reddit varies; capture common patterns
     titles = []
-    for h3 in soup.find_all("h3")[:25]:
-        t = (h3.get_text() or "").strip()
+    for h3 in tree.css("h3")[:25]:
+        t = (h3.text() or "").strip()
         if 12 <= len(t) <= 140:
             titles.append({"title": t})
     return titles
@@ -1,15 +1,16 @@
 import asyncio
-import json
 import requests
-from datetime import date
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime
+from sqlalchemy import insert
 
+from agents.aio import run_async
 from agents.content_intel.scraper import load_sources, fetch_many
 from agents.content_intel.parsers import (
     parse_google_trends_rss, parse_youtube_results, parse_reddit_titles
 )
-from agents.content_intel.ideation import build_daily_plan, generate_reel_ideas
+from agents.content_intel.ideation import build_plan_and_ideas
 
 from agents.content_intel.scheduler import build_calendar, export_csv
 
@@ -20,16 +21,61 @@ from db_models import (
     ContentType,
 )
 
-import os
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+from db import SessionLocal
 
 # Import API models (shared schema approach)
 # Easiest MVP: duplicate the models file in worker OR move models to /shared and import in both.
 # from app_models import DailyPlan, PostDraft, ApprovalStatus, ContentType  # see note below
 
+def _render_idea(idea: dict) -> tuple[str | None, str | None]:
+    """(hashtags_text, media_notes) for a PostDraft, coercing and stripping each value once."""
+    hashtag_parts = []
+    for h in idea.get("hashtags") or []:
+        h = str(h).strip()
+        if h:
+            hashtag_parts.append(h)
+
+    broll_parts = []
+    for x in idea.get("broll") or []:
+        x = str(x).strip()
+        if x:
+            broll_parts.append(f"- {x}")
+
+    script_outline = (idea.get("script_outline") or "").strip()
+
+    notes = []
+    if script_outline:
+        notes.append(f"Script outline:\n{script_outline}")
+    if broll_parts:
+        notes.append("B-roll ideas:\n" + "\n".join(broll_parts))
+
+    return "\n".join(hashtag_parts) or None, "\n\n".join(notes) or None
+
+# Pooled + retried session for feed fetches (reused across runs in the worker process)
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3)),
+)
+
+def _fetch_rss(url: str) -> str:
+    return _SESSION.get(url, timeout=30).text
+
+async def _gather_signals(rss_urls: list, html_urls: list, rules: dict, max_pages: int):
+    """RSS feeds and HTML pages are fetched concurrently; a failed feed yields None."""
+    async def _rss(url: str):
+        try:
+            return await asyncio.to_thread(_fetch_rss, url)
+        except Exception as e:
+            print("CONTENT_INTEL: rss error", url, repr(e))
+            return None
+
+    feeds, pages = await asyncio.gather(
+        asyncio.gather(*[_rss(u) for u in rss_urls]),
+        fetch_many(html_urls, rules, max_pages),
+    )
+    return feeds, pages
+
 def run_content_intel():
     cfg = load_sources("/shared/trend_sources.yaml")
     rules = cfg.get("rules", {})
@@ -39,11 +85,7 @@ def run_content_intel():
     # Gather signals
     signals = {"trends": [], "youtube": [], "reddit": []}
 
-    # Google Trends RSS: fetch with requests (no browser needed)
-    for s in sources:
-        if s["type"] == "rss":
-            xml = requests.get(s["url"], timeout=30).text
-            signals["trends"] = parse_google_trends_rss(xml)
+    rss_urls = [s["url"] for s in sources if s["type"] == "rss"]
 
     # HTML sources: use Playwright CDP
     html_urls = []
@@ -52,7 +94,13 @@ def run_content_intel():
             html_urls.extend(s.get("urls", []))
     html_urls = html_urls[:max_pages_total]
 
-    pages = asyncio.run(fetch_many(html_urls, rules, max_pages_total))
+    # on the worker's background loop, where the shared browser lives
+    feeds, pages = run_async(_gather_signals(rss_urls, html_urls, rules, max_pages_total))
+
+    # Google Trends RSS (no browser needed)
+    for xml in feeds:
+        if xml is not None:
+            signals["trends"] = parse_google_trends_rss(xml)
 
     # Parse pages by source heuristic
     for p in pages:
@@ -67,8 +115,7 @@ def run_content_intel():
             signals["reddit"].extend(parse_reddit_titles(html))
 
     # Synthesize outputs
-    plan_text = build_daily_plan(signals)
-    ideas = generate_reel_ideas(signals, n=5)
+    plan_text, ideas = build_plan_and_ideas(signals, n=5)
 
     calendar = build_calendar(ideas)
     # Create a combined export (idea + calendar fields)
@@ -104,26 +151,10 @@ def run_content_intel():
             existing.summary = plan_text
         db.add(existing)
 
-        # Insert post drafts as pending
+        # Insert post drafts as pending (one multi-row INSERT)
+        drafts = []
         for i, idea in enumerate(ideas):
-            hashtags_list = idea.get("hashtags") or []
-            broll_list = idea.get("broll") or []
-            script_outline = (idea.get("script_outline") or "").strip()
-
-            hashtags_text = "\n".join(
-                [str(h).strip() for h in hashtags_list if str(h).strip()]
-            ) or None
-
-            broll_text = "\n".join(
-                [f"- {str(x).strip()}" for x in broll_list if str(x).strip()]
-            )
-
-            media_notes = "\n\n".join(
-                part for part in [
-                    f"Script outline:\n{script_outline}" if script_outline else "",
-                    f"B-roll ideas:\n{broll_text}" if broll_text else "",
-                ] if part
-            ) or None
+            hashtags_text, media_notes = _render_idea(idea)
 
             scheduled_for = None
             if i < len(calendar):
@@ -133,19 +164,20 @@ def run_content_intel():
                 if hasattr(v, "isoformat"):
                     scheduled_for = v
                 elif isinstance(v, str) and v:
-                    from datetime import datetime
                     scheduled_for = datetime.fromisoformat(v)
 
-            pd = PostDraft(
-                content_type=ContentType.reel,
-                hook=(idea.get("hook") or "").strip() or None,
-                caption=(idea.get("caption") or "").strip(),
-                hashtags=hashtags_text,
-                media_notes=media_notes,
-                scheduled_for=scheduled_for,
-                status=ApprovalStatus.pending,
-            )
-            db.add(pd)
+            drafts.append({
+                "content_type": ContentType.reel,
+                "hook": (idea.get("hook") or "").strip() or None,
+                "caption": (idea.get("caption") or "").strip(),
+                "hashtags": hashtags_text,
+                "media_notes": media_notes,
+                "scheduled_for": scheduled_for,
+                "status": ApprovalStatus.pending,
+            })
+
+        if drafts:
+            db.execute(insert(PostDraft), drafts)
 
         db.commit()
         print("CONTENT_INTEL: commit OK")
@@ -32,13 +32,14 @@ def build_calendar(ideas: List[Dict[str, Any]], start_date: datetime | None = No
     return plan
 
 def export_csv(rows: List[Dict[str, Any]], path: str) -> str:
+    if not rows:
+        return path
+
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    fieldnames = list(rows[0].keys()) if rows else ["empty"]
 
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+    with open(path, "w", newline="", encoding="utf-8", buffering=1 << 16) as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
         w.writeheader()
-        for r in rows:
-            w.writerow(r)
+        w.writerows(rows)
 
     return path
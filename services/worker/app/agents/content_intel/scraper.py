@@ -1,7 +1,8 @@
 import os, random, asyncio
 from typing import List, Dict
 import yaml
-from playwright.async_api import async_playwright
+
+from agents.scrape import _ensure_browser
 
 def load_sources(path: str = "/app/shared/trend_sources.yaml") -> dict:
     with open(path, "r") as f:
@@ -11,23 +12,50 @@ async def _polite_sleep(rules: dict):
     lo, hi = rules.get("polite_delay_ms", [300, 900])
     await asyncio.sleep(random.randint(lo, hi) / 1000)
 
-async def fetch_html(url: str, rules: dict) -> str:
-    async with async_playwright() as p:
-        context = await browser.new_context(user_agent=rules.get("user_agent"))
+_BLOCKED_RESOURCES = {"image", "media", "font"}
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in _BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def fetch_html(url: str, rules: dict, browser) -> str:
+    context = await browser.new_context(
+        user_agent=rules.get("user_agent"),
+        java_script_enabled=True,
+        viewport={"width": 1280, "height": 900},
+    )
+    try:
+        # we only read markup; skip images/video/fonts
+        await context.route("**/*", _block_heavy_resources)
         page = await context.new_page()
-        await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        await page.goto(url, wait_until="domcontentloaded", timeout=int(rules.get("goto_timeout_ms", 8000)))
         await _polite_sleep(rules)
-        html = await page.content()
+        return await page.content()
+    finally:
         await context.close()
-        await browser.close()
-        return html
 
 async def fetch_many(urls: List[str], rules: dict, max_pages: int) -> List[Dict]:
-    results = []
-    for url in urls[:max_pages]:
-        try:
-            html = await fetch_html(url, rules)
-            results.append({"url": url, "html": html})
-        except Exception as e:
-            results.append({"url": url, "error": str(e)})
-    return results
+    """
+    Fetch pages concurrently over the shared browser (one context per URL).
+    Each page gets its own time budget, so one slow source can't stall the batch.
+    """
+    sem = asyncio.Semaphore(int(rules.get("concurrency", 4)))
+    budget_s = float(rules.get("per_page_timeout_s", 15))
+
+    async def _one(url: str, browser) -> Dict:
+        async with sem:
+            try:
+                html = await asyncio.wait_for(fetch_html(url, rules, browser), timeout=budget_s)
+                return {"url": url, "html": html}
+            except TimeoutError:
+                return {"url": url, "error": "timeout"}
+            except Exception as e:
+                return {"url": url, "error": str(e)}
+
+    # the process-wide browser (agents.scrape) is reused; only the contexts are per URL
+    browser, _ = await _ensure_browser()
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(_one(url, browser)) for url in urls[:max_pages]]
+    return [t.result() for t in tasks]
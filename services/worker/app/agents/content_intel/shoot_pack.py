@@ -1,4 +1,4 @@
-import json
+import orjson
 from typing import Optional, Dict, Any
 
 from agents.llm import draft
@@ -9,9 +9,10 @@ Avoid medical claims (no cures, no guarantees). Use benefit language that is cos
 Output must be valid JSON only.
 """
 
-def build_prompt(hook: str, caption: str, hashtags: Optional[str], media_notes: Optional[str]) -> str:
-    return f"""
-Create a structured "Shoot Pack" for a short Instagram Reel.
+# Output contract lives in the system text so it forms a stable, cacheable prefix;
+# the per-post inputs are the only thing that changes between calls.
+SHOOT_PACK_SYSTEM = SYSTEM + """
+Create a structured "Shoot Pack" for a short Instagram Reel from the inputs you are given.
 
 Return JSON with exactly these keys:
 - title
@@ -24,6 +25,15 @@ Return JSON with exactly these keys:
 - first_comment (string)
 - safety_checklist (array of 4-7 items)
 
+Rules:
+- Keep it actionable and easy to film at home.
+- Do not include medical claims.
+- Keep hook punchy and aligned with natural body care.
+- Make sure the JSON is valid (no trailing commas).
+"""
+
+def build_prompt(hook: str, caption: str, hashtags: Optional[str], media_notes: Optional[str]) -> str:
+    return f"""
 Inputs:
 HOOK:
 {hook or ""}
@@ -36,19 +46,13 @@ HASHTAGS (newline separated):
 
 EXISTING MEDIA NOTES:
 {media_notes or ""}
-
-Rules:
-- Keep it actionable and easy to film at home.
-- Do not include medical claims.
-- Keep hook punchy and aligned with natural body care.
-- Make sure the JSON is valid (no trailing commas).
 """
 
 def generate_shoot_pack(hook: str, caption: str, hashtags: Optional[str], media_notes: Optional[str]) -> Dict[str, Any]:
-    raw = draft(build_prompt(hook, caption, hashtags, media_notes), system=SYSTEM, temperature=0.4).strip()
+    raw = draft(build_prompt(hook, caption, hashtags, media_notes), system=SHOOT_PACK_SYSTEM, temperature=0.4).strip()
 
     # Sometimes models return text before JSON; harden by slicing first { to last }
     if "{" in raw and "}" in raw:
         raw = raw[raw.find("{"): raw.rfind("}") + 1]
 
-    return json.loads(raw)
+    return orjson.loads(raw)
@@ -1,25 +1,31 @@
 # services/worker/app/agents/engagement/comments.py
+import asyncio
 import re
 from typing import Dict, List, Optional
-from agents.llm import draft
+from agents.aio import run_async
+from agents.llm import adraft
 
 BRAND_VOICE = """You are Mary from Hello To Natural: warm, grounded, feminine, real.
 Write human comments that sound like a real woman—not a bot.
 No links. No emoji-only. Avoid generic praise. No repetitive phrasing.
 """
 
+_WS = re.compile(r"\s+")
+_MENTION = re.compile(r"@\w+")
+_HASH = re.compile(r"#\w+")
+
 def _word_count(s: str) -> int:
-    return len([w for w in re.split(r"\s+", s.strip()) if w])
+    return len([w for w in _WS.split(s.strip()) if w])
 
 def _sanitize(s: str) -> str:
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _WS.sub(" ", s).strip()
     # remove leading/trailing quotes
     s = s.strip('"\'')
 
     # avoid @mentions spam
-    s = re.sub(r"@\w+", "", s).strip()
+    s = _MENTION.sub("", s).strip()
     # avoid hashtags in comments
-    s = re.sub(r"#\w+", "", s).strip()
+    s = _HASH.sub("", s).strip()
     return s
 
 def _passes_rules(text: str) -> bool:
@@ -33,17 +39,8 @@ def _passes_rules(text: str) -> bool:
         return False
     return True
 
-def generate_comment(target: Dict, recent_comments: Optional[List[str]] = None) -> str:
-    """
-    target: { 'caption': str, 'author': str, 'url': str, 'topic_hint': str }
-    recent_comments used to reduce repetition.
-    """
-    caption = (target.get("caption") or "")[:600]
-    topic_hint = target.get("topic_hint") or "wellness"
-
-    avoid = "\n".join(f"- {c}" for c in (recent_comments or [])[-10:]) or "- (none)"
-
-    prompt = f"""
+def _comment_prompt(caption: str, topic_hint: str, avoid: str) -> str:
+    return f"""
 Write ONE Instagram comment.
 
 Requirements:
@@ -64,18 +61,49 @@ Avoid repeating these phrases/styles:
 
 Return ONLY the comment text.
 """
-    raw = draft(prompt, system=BRAND_VOICE, temperature=0.7)
-    text = _sanitize(raw)
 
-    # If LLM gives junk, force a second pass
-    if not _passes_rules(text):
-        repair_prompt = f"""
+def _repair_prompt(text: str, caption: str) -> str:
+    return f"""
 Fix this comment to meet rules (8–20 words, specific, not generic, no links/hashtags/@mentions).
 Bad comment: {text}
 Post caption: {caption}
 Return ONLY corrected comment.
 """
-        text = _sanitize(draft(repair_prompt, system=BRAND_VOICE, temperature=0.6))
+
+async def agenerate_comment(target: Dict, recent_comments: Optional[List[str]] = None) -> str:
+    """
+    target: { 'caption': str, 'author': str, 'url': str, 'topic_hint': str }
+    recent_comments used to reduce repetition.
+    """
+    caption = (target.get("caption") or "")[:600]
+    topic_hint = target.get("topic_hint") or "wellness"
+
+    avoid = "\n".join(f"- {c}" for c in (recent_comments or [])[-10:]) or "- (none)"
+
+    raw = await adraft(_comment_prompt(caption, topic_hint, avoid), system=BRAND_VOICE, temperature=0.7)
+    text = _sanitize(raw)
+
+    # If LLM gives junk, force a second pass
+    if not _passes_rules(text):
+        text = _sanitize(await adraft(_repair_prompt(text, caption), system=BRAND_VOICE, temperature=0.6))
 
     # Final hard clamp: if still invalid, return empty and mark failed upstream
-    return text if _passes_rules(text) else ""
\ No newline at end of file
+    return text if _passes_rules(text) else ""
+
+async def agenerate_comments(
+    targets: List[Dict],
+    recent_comments: Optional[List[str]] = None,
+    concurrency: int = 4,
+) -> List[str]:
+    """Comments for many targets concurrently (bounded); results keep the order of targets."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(target: Dict) -> str:
+        async with sem:
+            return await agenerate_comment(target, recent_comments)
+
+    return list(await asyncio.gather(*(_one(t) for t in targets)))
+
+def generate_comment(target: Dict, recent_comments: Optional[List[str]] = None) -> str:
+    """Sync wrapper around agenerate_comment (runs on the process's background loop)."""
+    return run_async(agenerate_comment(target, recent_comments))
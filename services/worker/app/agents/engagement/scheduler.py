@@ -1,4 +1,5 @@
 # services/worker/app/agents/engagement/scheduler.py
+import heapq
 from datetime import datetime, timedelta
 from typing import List
 
@@ -17,17 +18,12 @@ def schedule_actions(
 
     # spacing in minutes
     step = max(2, int(60 / per_hour))  # e.g. 25/hr -> 2 min
-    times = []
-    t = start_at
-
-    for i in range(count):
-        # simple jitter wave: -jitter..+jitter (deterministic)
-        j = (i % 3) * jitter_minutes - jitter_minutes  # -6, 0, +6
-        scheduled = t + timedelta(minutes=j)
-        times.append(scheduled)
-
-        t = t + timedelta(minutes=step)
-
-    # Ensure non-decreasing
-    times.sort()
-    return times
\ No newline at end of file
+    # Work in integer minute offsets and build each datetime once at the end.
+    # simple jitter wave: -jitter..+jitter (deterministic), e.g. -6, 0, +6.
+    # Each jitter phase (i % 3) is already an increasing sequence, so merging the three
+    # keeps the result non-decreasing without a full sort.
+    phases = (
+        range(r * step + (r - 1) * jitter_minutes, count * step + (r - 1) * jitter_minutes, 3 * step)
+        for r in range(3)
+    )
+    return [start_at + timedelta(minutes=m) for m in heapq.merge(*phases)]
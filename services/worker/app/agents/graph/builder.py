@@ -10,58 +10,82 @@ This is designed to be resilient to scraping failures: it will skip anything it
 
 from __future__ import annotations
 
-import re
+import heapq
 from datetime import datetime
 
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from db_models import Creator, CreatorEdge, CreatorEdgeType
+from agents.outreach.handle_regex import HANDLE_RE as MENTION_RE
 from agents.outreach.similarity import similarity_score
 
 
-MENTION_RE = re.compile(r"@([A-Za-z0-9_\.]{2,30})")
-
-
 def extract_mentions(text: str) -> set[str]:
     if not text:
         return set()
-    handles = {m.group(1).lstrip("@").lower() for m in MENTION_RE.finditer(text)}
+    # memchr for the first "@": pages without mentions never reach the regex
+    start = text.find("@")
+    if start < 0:
+        return set()
+    handles = {m.group(1).lower() for m in MENTION_RE.finditer(text, start)}
     # Filter obvious non-handles
     return {h for h in handles if h and not h.isdigit()}
 
 
-def upsert_edge(db: Session, source_id: int, target_id: int, edge_type: CreatorEdgeType, weight: float, metadata: dict | None = None):
-    if source_id == target_id:
+def upsert_edges(db: Session, rows: list[dict]) -> None:
+    """Upsert many edges in one INSERT .. ON CONFLICT (uq_creator_edges).
+
+    rows: {source_id, target_id, edge_type, weight, metadata}. Weights accumulate gently
+    (the max wins) and existing metadata is kept when the new row has none.
+    """
+    now = datetime.utcnow()
+    values: dict[tuple, dict] = {}
+    for r in rows:
+        if r["source_id"] == r["target_id"]:
+            continue
+        key = (r["source_id"], r["target_id"], r["edge_type"])
+        weight = float(r.get("weight") or 0.0)
+        # one statement can't touch the same row twice
+        if key in values and values[key]["weight"] >= weight:
+            continue
+        values[key] = {
+            "source_creator_id": r["source_id"],
+            "target_creator_id": r["target_id"],
+            "edge_type": r["edge_type"],
+            "weight": weight,
+            "metadata": r.get("metadata"),
+            "last_seen_at": now,
+            "created_at": now,
+        }
+    if not values:
         return
-    row = (
-        db.query(CreatorEdge)
-        .filter(CreatorEdge.source_creator_id == source_id)
-        .filter(CreatorEdge.target_creator_id == target_id)
-        .filter(CreatorEdge.edge_type == edge_type)
-        .first()
+
+    # Core table: the JSONB column is literally named "metadata"
+    edges = CreatorEdge.__table__
+    stmt = pg_insert(edges).values(list(values.values()))
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_creator_edges",
+        set_={
+            "weight": func.greatest(edges.c.weight, stmt.excluded.weight),
+            "metadata": func.coalesce(stmt.excluded.metadata, edges.c.metadata),
+            "last_seen_at": stmt.excluded.last_seen_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def upsert_edge(db: Session, source_id: int, target_id: int, edge_type: CreatorEdgeType, weight: float, metadata: dict | None = None):
+    upsert_edges(
+        db,
+        [{"source_id": source_id, "target_id": target_id, "edge_type": edge_type, "weight": weight, "metadata": metadata}],
     )
-    now = datetime.utcnow()
-    if not row:
-        row = CreatorEdge(
-            source_creator_id=source_id,
-            target_creator_id=target_id,
-            edge_type=edge_type,
-            weight=float(weight or 0.0),
-            metadata=metadata,
-            last_seen_at=now,
-            created_at=now,
-        )
-    else:
-        # gentle accumulation
-        row.weight = float(max(row.weight or 0.0, weight or 0.0))
-        row.edge_metadata = metadata or row.edge_metadata
-        row.last_seen_at = now
-    db.add(row)
 
 
 def ensure_creator(db: Session, handle: str, platform: str = "instagram") -> Creator:
     handle = handle.lstrip("@").strip().lower()
-    c = db.query(Creator).filter(Creator.handle == handle).first()
+    c = db.query(Creator).filter(func.lower(Creator.handle) == handle).first()
     if c:
         return c
     c = Creator(handle=handle, platform=platform, created_at=datetime.utcnow(), score=0)
@@ -70,22 +94,33 @@ def ensure_creator(db: Session, handle: str, platform: str = "instagram") -> Cre
     return c
 
 
-def build_similarity_edges(db: Session, base_creator: Creator, candidates: list[Creator], top_k: int = 25):
-    scored = []
-    for c in candidates:
-        if c.id == base_creator.id:
-            continue
-        s = similarity_score(base_creator, c)
-        if s <= 0:
-            continue
-        scored.append((s, c))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    for s, c in scored[:top_k]:
-        upsert_edge(
-            db,
-            source_id=base_creator.id,
-            target_id=c.id,
-            edge_type=CreatorEdgeType.similarity,
-            weight=float(s),
-            metadata={"method": "jaccard+bucket"},
-        )
+def build_similarity_edges(
+    db: Session,
+    base_creator: Creator,
+    candidates: list[Creator],
+    top_k: int = 25,
+    scores: list[float] | None = None,
+):
+    """scores: optional precomputed similarity_score per candidate (see similarity_matrix)."""
+    if scores is None:
+        scores = [similarity_score(base_creator, c) for c in candidates]
+    scored = (
+        (s, c)
+        for s, c in zip(scores, candidates)
+        if c.id != base_creator.id and s > 0
+    )
+    # only the top_k survive, so keep a bounded heap instead of sorting every candidate
+    top = heapq.nlargest(top_k, scored, key=lambda x: x[0])
+    upsert_edges(
+        db,
+        [
+            {
+                "source_id": base_creator.id,
+                "target_id": c.id,
+                "edge_type": CreatorEdgeType.similarity,
+                "weight": float(s),
+                "metadata": {"method": "jaccard+bucket"},
+            }
+            for s, c in top
+        ],
+    )
@@ -1,50 +1,236 @@
 import os
+import asyncio
+import weakref
+import httpx
+import orjson
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Optional
 
+import random
 import time
 from requests.exceptions import ReadTimeout, ConnectionError
 
+from agents.aio import run_async
+from agents.llm_cache import cached
+
 BASE = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
 MODEL_MAIN = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 # MODEL_FAST = os.getenv("OLLAMA_MODEL_FAST", "qwen2.5:7b")
 MODEL_FAST = os.getenv("OLLAMA_MODEL_FAST", MODEL_MAIN)
 
 TIMEOUT = int(os.getenv("LLM_TIMEOUT_SECONDS", "600"))  # default 10 min
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# think() plans with the main model and may legitimately run long; draft() calls are short
+# and should fail fast instead of holding a worker slot.
+THINK_TIMEOUT = int(os.getenv("LLM_THINK_TIMEOUT_SECONDS", str(TIMEOUT)))
+DRAFT_TIMEOUT = int(os.getenv("LLM_DRAFT_TIMEOUT_SECONDS", "180"))
+# Bound generation length and context so one runaway completion can't stall the queue.
+# The token cap leaves room for the largest JSON reply (plan + ideas).
+MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1536"))
+NUM_CTX = int(os.getenv("LLM_CTX", "4096"))
+# Responses are streamed: a generation that sends nothing for this long is treated as
+# stuck (the first chunk waits on prompt evaluation, so keep it generous), while the
+# think/draft timeouts above bound the whole generation.
+IDLE_TIMEOUT = float(os.getenv("LLM_IDLE_TIMEOUT_SECONDS", "120"))
+# Keep the model loaded between calls so Ollama can reuse the KV cache for an
+# identical prompt prefix (the static system/contract text).
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+
+# One keep-alive pool per process: each call reuses a socket to Ollama instead of
+# opening a new connection. Retries stay in _post_with_retry.
+_SESSION = requests.Session()
+_SESSION.mount(BASE, HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0))
+
+# Async callers share one bounded client per event loop (an httpx pool is bound to the
+# loop it was first used on; sync callers go through the long-lived agents.aio loop).
+LLM_CONCURRENCY = int(os.getenv("LLM_CONC", "16"))
+_ACLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _aclient() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _ACLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=BASE,
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_CONCURRENCY, max_keepalive_connections=LLM_CONCURRENCY),
+        )
+        _ACLIENTS[loop] = client
+    return client
 
-def _generate(model: str, prompt: str, system: Optional[str], temperature: float) -> str:
+async def aclose() -> None:
+    """Close the running loop's Ollama client; await it before the loop shuts down."""
+    client = _ACLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def _payload(model: str, prompt: str, system: Optional[str], temperature: float) -> dict:
     payload = {
         "model": model,
-        "prompt": prompt if system is None else f"{system}\n\n{prompt}",
-        "stream": False,
-        "options": {"temperature": temperature},
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": temperature, "num_predict": MAX_TOKENS, "num_ctx": NUM_CTX},
     }
-    r = _post_with_retry(f"{BASE}/api/generate", payload, TIMEOUT, retries=2)
-    
-    if r.status_code >= 400:
-        raise RuntimeError(
-            f"Ollama error {r.status_code} using model '{model}': {r.text[:500]}"
-        )
+    if system is not None:
+        # Static instructions go first so repeated calls share a cacheable prefix.
+        payload["system"] = system
+    return payload
+
+def _stream_chunk(line, parts: List[str], model: str) -> bool:
+    """Append one NDJSON chunk's text to parts; True once Ollama reports done."""
+    chunk = orjson.loads(line)
+    if chunk.get("error"):
+        raise RuntimeError(f"Ollama error using model '{model}': {str(chunk['error'])[:500]}")
+    parts.append(chunk.get("response") or "")
+    return bool(chunk.get("done"))
+
+@cached
+def _generate(model: str, prompt: str, system: Optional[str], temperature: float, read_timeout: float = TIMEOUT) -> str:
+    payload = _payload(model, prompt, system, temperature)
+    # the socket read timeout is the idle watchdog; the deadline bounds the whole call
+    r = _post_with_retry(f"{BASE}/api/generate", payload, (CONNECT_TIMEOUT, IDLE_TIMEOUT), retries=2)
+    deadline = time.monotonic() + read_timeout
 
-    return r.json().get("response", "").strip()
+    with r:
+        if r.status_code >= 400:
+            raise RuntimeError(
+                f"Ollama error {r.status_code} using model '{model}': {r.text[:500]}"
+            )
 
-def think(prompt: str, system: Optional[str] = None, temperature: float = 0.4) -> str:
-    """Higher-quality reasoning/planning."""
-    return _generate(MODEL_MAIN, prompt, system, temperature)
+        parts: List[str] = []
+        try:
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                if _stream_chunk(line, parts, model):
+                    break
+                if time.monotonic() > deadline:
+                    raise ReadTimeout(f"Ollama generation exceeded {read_timeout}s")
+        except ConnectionError as e:
+            # requests surfaces a mid-stream socket timeout as ConnectionError
+            raise ReadTimeout(f"Ollama stream idle for {IDLE_TIMEOUT}s") from e
+
+    return "".join(parts).strip()
+
+async def _agenerate(model: str, prompt: str, system: Optional[str], temperature: float, read_timeout: float = TIMEOUT) -> str:
+    payload = _payload(model, prompt, system, temperature)
+    timeout = httpx.Timeout(IDLE_TIMEOUT, connect=CONNECT_TIMEOUT)
+    r = await _apost_with_retry(_aclient(), "/api/generate", payload, timeout, retries=2)
+    deadline = time.monotonic() + read_timeout
 
-def draft(prompt: str, system: Optional[str] = None, temperature: float = 0.6) -> str:
     try:
-        return _generate(MODEL_FAST, prompt, system, temperature)
+        if r.status_code >= 400:
+            await r.aread()
+            raise RuntimeError(
+                f"Ollama error {r.status_code} using model '{model}': {r.text[:500]}"
+            )
+
+        parts: List[str] = []
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            if _stream_chunk(line, parts, model):
+                break
+            if time.monotonic() > deadline:
+                raise httpx.ReadTimeout(f"Ollama generation exceeded {read_timeout}s", request=r.request)
+    finally:
+        await r.aclose()
+
+    return "".join(parts).strip()
+
+def think(prompt: str, system: Optional[str] = None, temperature: float = 0.4, cache: bool = True) -> str:
+    """Higher-quality reasoning/planning. cache=False bypasses the response cache."""
+    return _generate(MODEL_MAIN, prompt, system, temperature, cache=cache, read_timeout=THINK_TIMEOUT)
+
+def draft(prompt: str, system: Optional[str] = None, temperature: float = 0.6, cache: bool = True) -> str:
+    try:
+        return _generate(MODEL_FAST, prompt, system, temperature, cache=cache, read_timeout=DRAFT_TIMEOUT)
     except ReadTimeout:
         return "LLM timeout — fallback: propose 3 short reel hooks + CTA (manual review required)."
 
-def _post_with_retry(url: str, payload: dict, timeout: int, retries: int = 2):
-    delay = 2
+async def athink(prompt: str, system: Optional[str] = None, temperature: float = 0.4) -> str:
+    """Async think()."""
+    return await _agenerate(MODEL_MAIN, prompt, system, temperature, read_timeout=THINK_TIMEOUT)
+
+async def adraft(prompt: str, system: Optional[str] = None, temperature: float = 0.6) -> str:
+    """Async draft(): lets callers overlap many LLM round-trips on one event loop."""
+    try:
+        return await _agenerate(MODEL_FAST, prompt, system, temperature, read_timeout=DRAFT_TIMEOUT)
+    except httpx.ReadTimeout:
+        return "LLM timeout — fallback: propose 3 short reel hooks + CTA (manual review required)."
+
+# Ollama serves this many requests of one model at once (OLLAMA_NUM_PARALLEL); batching
+# more than that client-side just queues on the server.
+NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+async def adraft_many(
+    prompts: List[str],
+    system: Optional[str] = None,
+    temperature: float = 0.6,
+    concurrency: int = NUM_PARALLEL,
+) -> List[str]:
+    """adraft() over many prompts with at most `concurrency` in flight; keeps prompt order."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(prompt: str) -> str:
+        async with sem:
+            return await adraft(prompt, system=system, temperature=temperature)
+
+    return list(await asyncio.gather(*(_one(p) for p in prompts)))
+
+def draft_many(prompts: List[str], system: Optional[str] = None, temperature: float = 0.6) -> List[str]:
+    """Sync entry point for adraft_many() (Celery tasks)."""
+    if not prompts:
+        return []
+
+    # the background loop keeps its pooled client between calls
+    return run_async(adraft_many(prompts, system=system, temperature=temperature))
+
+# Transient statuses worth another attempt; any other error response (bad model name,
+# malformed payload, ...) is returned immediately since retrying can't fix it.
+RETRY_STATUSES = frozenset({408, 425, 429, 502, 503, 504})
+MAX_BACKOFF_SECONDS = 30.0
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Jittered exponential delay (~2s, ~4s, ...), or the server's Retry-After seconds."""
+    delay = 2 ** (attempt + 1) + random.uniform(0, 0.5)
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:  # HTTP-date form; keep our own delay
+            pass
+    return max(0.0, min(MAX_BACKOFF_SECONDS, delay))
+
+def _post_with_retry(url: str, payload: dict, timeout: tuple[float, float], retries: int = 2):
     for attempt in range(retries + 1):
         try:
-            return requests.post(url, json=payload, timeout=timeout)
+            r = _SESSION.post(url, json=payload, timeout=timeout, stream=True)
         except (ReadTimeout, ConnectionError):
             if attempt == retries:
                 raise
-            time.sleep(delay)
-            delay *= 2
+            time.sleep(_backoff(attempt))
+            continue
+        if r.status_code in RETRY_STATUSES and attempt < retries:
+            r.close()
+            time.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+            continue
+        return r
+
+async def _apost_with_retry(client: httpx.AsyncClient, url: str, payload: dict, timeout: httpx.Timeout, retries: int = 2):
+    for attempt in range(retries + 1):
+        try:
+            request = client.build_request("POST", url, json=payload, timeout=timeout)
+            r = await client.send(request, stream=True)
+        except (httpx.ReadTimeout, httpx.ConnectError):
+            if attempt == retries:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        if r.status_code in RETRY_STATUSES and attempt < retries:
+            await r.aclose()
+            await asyncio.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+            continue
+        return r
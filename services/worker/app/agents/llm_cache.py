@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Low-temperature calls (plans, JSON repair passes) are close to deterministic, so their
+# responses are reused: first from an in-process LRU, then from a SQLite file that
+# survives worker restarts. Higher temperatures are meant to vary and are never cached.
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/logs/llm_cache.sqlite3")
+CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+# Entries expire after CACHE_TTL_SECONDS; expired rows are pruned every PRUNE_INTERVAL
+# seconds, together with the oldest rows beyond CACHE_MAX_ROWS.
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "50000"))
+PRUNE_INTERVAL = int(os.getenv("LLM_CACHE_PRUNE_INTERVAL_SECONDS", "3600"))
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+_disabled = False
+_last_prune = 0.0
+
+def cache_key(model: str, prompt: str, system: Optional[str], temperature: float) -> str:
+    raw = f"{model}|{temperature}|{system or ''}|{prompt}".encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _db() -> Optional[sqlite3.Connection]:
+    global _conn, _conn_pid, _disabled
+    if _disabled:
+        return None
+    # celery prefork: never share a connection opened in the parent
+    if _conn is None or _conn_pid != os.getpid():
+        try:
+            os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+            _conn = sqlite3.connect(CACHE_PATH, timeout=5, check_same_thread=False)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in _conn.execute("PRAGMA table_info(llm_cache)")}
+            if "expires_at" not in columns:
+                # cache files written before expiry existed: age their rows from created_at
+                _conn.execute("ALTER TABLE llm_cache ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+                _conn.execute("UPDATE llm_cache SET expires_at = created_at + ?", (CACHE_TTL_SECONDS,))
+            _conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires_at ON llm_cache (expires_at)")
+            _conn.commit()
+            _conn_pid = os.getpid()
+        except sqlite3.Error:
+            _disabled = True
+            _conn = None
+    return _conn
+
+def get(key: str) -> Optional[str]:
+    with _lock:
+        conn = _db()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+    return row[0] if row else None
+
+def put(key: str, response: str) -> None:
+    with _lock:
+        conn = _db()
+        if conn is None:
+            return
+        now = time.time()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now + CACHE_TTL_SECONDS),
+            )
+            _prune(conn, now)
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+def _prune(conn: sqlite3.Connection, now: float) -> None:
+    """Drop expired rows and cap the table size; runs at most once per PRUNE_INTERVAL."""
+    global _last_prune
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+    conn.execute(
+        "DELETE FROM llm_cache WHERE key IN "
+        "(SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_ROWS,),
+    )
+
+class _Uncacheable(Exception):
+    """Carries an empty response out of the LRU so it isn't memoized."""
+    def __init__(self, value: str):
+        self.value = value
+
+def cached(generate: Callable[..., str]):
+    """Wrap a (model, prompt, system, temperature, **opts) -> str generator with the response cache.
+
+    Keyword options (e.g. timeouts) are passed through but are not part of the persistent key.
+    cache=False skips the cache for one call (prompts whose reply must not be replayed).
+    """
+
+    # _ttl_bucket is part of the LRU key only, so in-process entries age out with the TTL too
+    @functools.lru_cache(maxsize=512)
+    def _memo(model: str, prompt: str, system: Optional[str], temperature: float, _ttl_bucket: int, **opts: Any) -> str:
+        key = cache_key(model, prompt, system, temperature)
+        hit = get(key)
+        if hit is not None:
+            return hit
+        out = generate(model, prompt, system, temperature, **opts)
+        if not out:
+            raise _Uncacheable(out)
+        put(key, out)
+        return out
+
+    @functools.wraps(generate)
+    def wrapper(
+        model: str, prompt: str, system: Optional[str], temperature: float, *, cache: bool = True, **opts: Any
+    ) -> str:
+        if not cache or not CACHE_ENABLED or temperature > CACHE_MAX_TEMPERATURE:
+            return generate(model, prompt, system, temperature, **opts)
+        try:
+            return _memo(model, prompt, system, temperature, int(time.time() // CACHE_TTL_SECONDS), **opts)
+        except _Uncacheable as e:
+            return e.value
+
+    return wrapper
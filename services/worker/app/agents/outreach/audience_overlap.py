@@ -9,21 +9,39 @@ Returns a 0..1 score.
 
 from __future__ import annotations
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from db_models import CreatorEdge, CreatorEdgeType
 from agents.outreach.similarity import jaccard_tags
 
 
-def _neighbors(db: Session, creator_id: int) -> set[int]:
-    rows = (
-        db.query(CreatorEdge.target_creator_id)
-        .filter(CreatorEdge.source_creator_id == creator_id)
-        .filter(CreatorEdge.edge_type.in_([CreatorEdgeType.mention, CreatorEdgeType.co_mentioned]))
-        .limit(500)
-        .all()
+_NEIGHBOR_LIMIT = 500
+
+
+def _neighbors_pair(db: Session, a_id: int, b_id: int) -> tuple[set[int], set[int]]:
+    """Neighbor ids of both creators in one round-trip (at most _NEIGHBOR_LIMIT each)."""
+    rn = func.row_number().over(partition_by=CreatorEdge.source_creator_id).label("rn")
+    sub = (
+        select(CreatorEdge.source_creator_id, CreatorEdge.target_creator_id, rn)
+        .where(CreatorEdge.source_creator_id.in_((a_id, b_id)))
+        .where(CreatorEdge.edge_type.in_([CreatorEdgeType.mention, CreatorEdgeType.co_mentioned]))
+        .subquery()
     )
-    return {r[0] for r in rows if r and r[0]}
+    rows = db.execute(
+        select(sub.c.source_creator_id, sub.c.target_creator_id).where(sub.c.rn <= _NEIGHBOR_LIMIT)
+    ).all()
+
+    na: set[int] = set()
+    nb: set[int] = set()
+    for source_id, target_id in rows:
+        if not target_id:
+            continue
+        if source_id == a_id:
+            na.add(target_id)
+        if source_id == b_id:
+            nb.add(target_id)
+    return na, nb
 
 
 def overlap_score(db: Session, creator_a, creator_b) -> float:
@@ -31,12 +49,10 @@ def overlap_score(db: Session, creator_a, creator_b) -> float:
 
     # graph neighbor overlap (optional)
     try:
-        na = _neighbors(db, creator_a.id)
-        nb = _neighbors(db, creator_b.id)
+        na, nb = _neighbors_pair(db, creator_a.id, creator_b.id)
         if na and nb:
-            inter = len(na.intersection(nb))
-            union = len(na.union(nb)) or 1
-            graph_sim = inter / union
+            inter = len(na & nb)
+            graph_sim = inter / ((len(na) + len(nb) - inter) or 1)
         else:
             graph_sim = 0.0
     except Exception:
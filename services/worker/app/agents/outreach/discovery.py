@@ -13,59 +13,50 @@ Workflow:
 
 from __future__ import annotations
 
+import asyncio
 import os
 import random
-import re
 from datetime import datetime
 
 import yaml
 
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from db_models import Creator
-from agents.outreach.fraud_detection import is_excludable, assess_fraud
-from agents.outreach.discovery_engine import discover_handles, enrich_and_filter, discover_related_handles
+from agents.aio import run_async
+from agents.outreach.fraud_detection import assess_fraud
+from agents.outreach.discovery_engine import compile_exclude_rules, discover_handles, enrich_and_filter, discover_related_handles
+from agents.outreach.handle_regex import HANDLE_RE as MENTION_RE, extract_handles
 
-MENTION_RE = re.compile(r"@([A-Za-z0-9_\.]{2,30})")
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # libyaml when available
 
-def load_targeting_config(path: str = "/shared/targeting.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
-
-
-def extract_handles(text: str) -> list[str]:
-    if not text:
-        return []
-    found = [m.group(1).lstrip("@").lower() for m in MENTION_RE.finditer(text)]
-    # de-dupe, preserve order
-    seen = set()
-    out = []
-    for h in found:
-        if h in seen:
-            continue
-        if len(h) < 2:
-            continue
-        seen.add(h)
-        out.append(h)
-    return out
-
-
-def excluded_by_rules(handle: str, text: str, cfg: dict) -> tuple[bool, str | None]:
-    ex = (((cfg.get("instagram") or {}).get("exclude")) or {})
-    handle_contains = [x.lower() for x in (ex.get("handle_contains") or [])]
-    text_contains = [x.lower() for x in (ex.get("text_contains") or [])]
-
-    h = (handle or "").lower()
-    if any(x in h for x in handle_contains):
-        return True, "handle_excluded"
-
-    t = (text or "").lower()
-    if any(x in t for x in text_contains):
-        return True, "text_excluded"
+# path -> (mtime_ns, parsed config); re-parsed only when the file changes
+_CFG_CACHE: dict[str, tuple[int, dict]] = {}
 
-    return False, None
 
-async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4) -> dict:
+def load_targeting_config(path: str = "/shared/targeting.yaml") -> dict:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _CFG_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        cfg = yaml.load(f, Loader=_YAML_LOADER) or {}
+    _CFG_CACHE[path] = (mtime, cfg)
+    return cfg
+
+
+# Upper bound for each crawl stage on the shared background loop; a hung page must not
+# wedge the Celery thread waiting on it.
+STAGE_TIMEOUT = float(os.getenv("DISCOVERY_STAGE_TIMEOUT_SECONDS", "1800"))
+
+
+def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4) -> dict:
+    """
+    Sync entry point (Celery task thread). The crawl stages run on the process's background
+    loop via run_async; every DB read/write stays in the calling thread.
+    """
     cfg = load_targeting_config()
     ig = (cfg.get("instagram") or {})
 
@@ -110,6 +101,7 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
     max_total_handles = _get_int("max_total_handles", int(limit * oversample_factor))
     include_excluded_in_db = _get_bool("include_excluded_in_db", False)
     enrich_concurrency = _get_int("enrich_concurrency", 6)
+    exclude_rules = compile_exclude_rules(cfg)
 
     # --- results ---
     created = 0
@@ -128,23 +120,73 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
     }
 
     # 1) Discover candidate handles (oversample so we can filter down to niche)
-    handles = await discover_handles(
-        seed_hashtags=sample,
-        per_hashtag_posts=per_hashtag_posts,
-        max_total_handles=max_total_handles,
+    handles = run_async(
+        discover_handles(
+            seed_hashtags=sample,
+            per_hashtag_posts=per_hashtag_posts,
+            max_total_handles=max_total_handles,
+        ),
+        timeout=STAGE_TIMEOUT,
     )
 
-    # 2) Enrich + filter
-    enriched = await enrich_and_filter(
-        handles,
-        follower_min=follower_min,
-        follower_max=follower_max,
-        hard_max_followers=hard_max_followers,
-        include_excluded=include_excluded_in_db,
-        max_concurrency=enrich_concurrency,
-    )
+    # Related-expansion seeds come from creators already in the DB, so their crawl does
+    # not have to wait for this run's enrichment/upsert.
+    seed_handles: list[str] = []
+    if enable_related:
+        seed_rows = (
+            db.query(Creator.handle)
+            .filter(Creator.is_brand.is_(False))
+            .filter(Creator.is_spam.is_(False))
+            .order_by(
+                Creator.score.desc().nullslast(),
+                Creator.followers_est.desc().nullslast(),
+                Creator.created_at.desc(),
+            )
+            .limit(related_seed_count)
+            .all()
+        )
+        seed_handles = [r.handle for r in seed_rows if r.handle]
+
+    async def _discover_related() -> list[str]:
+        if not seed_handles:
+            return []
+        return await discover_related_handles(
+            seed_handles,
+            per_seed_posts=related_per_seed_posts,
+            max_total_handles=related_max_total_handles,
+            max_concurrency=related_enrich_concurrency,
+        )
+
+    # 2) Enrich + filter, overlapped with the related-handle crawl (each stage keeps its
+    # own concurrency bound)
+    async def _enrich_and_expand() -> tuple[list[dict], list[str]]:
+        return await asyncio.gather(
+            enrich_and_filter(
+                handles,
+                follower_min=follower_min,
+                follower_max=follower_max,
+                hard_max_followers=hard_max_followers,
+                include_excluded=include_excluded_in_db,
+                exclude_rules=exclude_rules,
+                max_concurrency=enrich_concurrency,
+            ),
+            _discover_related(),
+        )
+
+    enriched, related_handles = run_async(_enrich_and_expand(), timeout=STAGE_TIMEOUT)
 
     # 3) Upsert hashtag-discovered creators (cap eligible new inserts to `limit`)
+    # One SELECT for every candidate handle, ORM updates for known rows (flushed as a
+    # batch), and one multi-row INSERT .. ON CONFLICT for new ones.
+    candidate_handles = {(item.get("handle") or "").lower().lstrip("@") for item in enriched} - {""}
+    existing_map = {
+        c.handle.lower(): c
+        for c in db.query(Creator).filter(func.lower(Creator.handle).in_(candidate_handles)).all()
+    } if candidate_handles else {}
+    new_rows: dict[str, dict] = {}
+    niche_tags_str = ", ".join(sample)[:1500]
+    notes_str = f"Discovered via hashtags: {', '.join(sample)}"
+
     for item in enriched:
         if item.get("excluded"):
             excluded_seen += 1
@@ -156,7 +198,7 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
             skipped += 1
             continue
 
-        existing = db.query(Creator).filter(Creator.handle == h).first()
+        existing = existing_map.get(h)
         if existing:
             if item.get("followers_est") is not None:
                 existing.followers_est = item["followers_est"]
@@ -176,6 +218,18 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
             updated += 1
             continue
 
+        pending = new_rows.get(h)
+        if pending:
+            # repeated handle in this batch: refresh the row we are about to insert
+            if item.get("followers_est") is not None:
+                pending["followers_est"] = item["followers_est"]
+            if item.get("posts_count") is not None:
+                pending["posts_count"] = item["posts_count"]
+            pending["is_brand"] = bool(item.get("is_brand", False))
+            pending["is_spam"] = bool(item.get("is_spam", False))
+            updated += 1
+            continue
+
         # enforce limit for eligible inserts
         if not item.get("excluded") and created >= limit:
             break
@@ -187,24 +241,46 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
             posts_count=item.get("posts_count"),
             is_brand=bool(item.get("is_brand", False)),
             is_spam=bool(item.get("is_spam", False)),
-            niche_tags=", ".join(sample)[:1500],
-            notes=f"Discovered via hashtags: {', '.join(sample)}",
+            niche_tags=niche_tags_str,
+            notes=notes_str,
             created_at=datetime.utcnow(),
             fraud_flags={"exclude_reason": item.get("exclude_reason") or ""},
         )
 
         fraud_score, flags = assess_fraud(c)
-        c.fraud_score = fraud_score
-        c.fraud_flags = {**(c.fraud_flags or {}), **(flags or {})}
-
-        db.add(c)
+        new_rows[h] = {
+            "handle": c.handle,
+            "platform": c.platform,
+            "followers_est": c.followers_est,
+            "posts_count": c.posts_count,
+            "is_brand": c.is_brand,
+            "is_spam": c.is_spam,
+            "niche_tags": c.niche_tags,
+            "notes": c.notes,
+            "created_at": c.created_at,
+            "fraud_score": fraud_score,
+            "fraud_flags": {**(c.fraud_flags or {}), **(flags or {})},
+        }
 
         if item.get("excluded"):
             excluded_created += 1
         else:
             created += 1
 
-    # Make new rows visible for seed selection (without committing)
+    if new_rows:
+        stmt = pg_insert(Creator).values(list(new_rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[func.lower(Creator.handle)],
+            set_={
+                "followers_est": stmt.excluded.followers_est,
+                "posts_count": stmt.excluded.posts_count,
+                "is_brand": stmt.excluded.is_brand,
+                "is_spam": stmt.excluded.is_spam,
+            },
+        )
+        db.execute(stmt)
+
+    # Make updated rows visible to the related-expansion lookups (without committing)
     try:
         db.flush()
     except Exception:
@@ -212,37 +288,22 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
 
     # 4) Related expansion (run ONCE)
     if enable_related:
-        seed_rows = (
-            db.query(Creator)
-            .filter(Creator.is_brand.is_(False))
-            .filter(Creator.is_spam.is_(False))
-            .order_by(
-                Creator.score.desc().nullslast(),
-                Creator.followers_est.desc().nullslast(),
-                Creator.created_at.desc(),
-            )
-            .limit(related_seed_count)
-            .all()
-        )
-        seed_handles = [c.handle for c in seed_rows if c.handle]
         related["seed_count"] = len(seed_handles)
 
         if seed_handles:
-            related_handles = await discover_related_handles(
-                seed_handles,
-                per_seed_posts=related_per_seed_posts,
-                max_total_handles=related_max_total_handles,
-                max_concurrency=related_enrich_concurrency,
-            )
             related["handles_found"] = len(related_handles)
 
-            related_enriched = await enrich_and_filter(
-                related_handles,
-                follower_min=follower_min,
-                follower_max=follower_max,
-                hard_max_followers=hard_max_followers,
-                include_excluded=False,
-                max_concurrency=related_enrich_concurrency,
+            related_enriched = run_async(
+                enrich_and_filter(
+                    related_handles,
+                    follower_min=follower_min,
+                    follower_max=follower_max,
+                    hard_max_followers=hard_max_followers,
+                    include_excluded=False,
+                    exclude_rules=exclude_rules,
+                    max_concurrency=related_enrich_concurrency,
+                ),
+                timeout=STAGE_TIMEOUT,
             )
             related["enriched_count"] = len(related_enriched)
 
@@ -251,23 +312,38 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
 
             # cap related inserts (separate cap so related can add more)
             add_cap = limit
+            related_notes = f"Related expansion from seeds: {', '.join(seed_handles[:5])}{'...' if len(seed_handles) > 5 else ''}"
+
+            # one lookup for every related handle, then one bulk UPDATE and one INSERT
+            related_set = {(item.get("handle") or "").lower().lstrip("@") for item in related_enriched} - {""}
+            existing_ids = dict(
+                db.query(func.lower(Creator.handle), Creator.id)
+                .filter(func.lower(Creator.handle).in_(related_set))
+                .all()
+            ) if related_set else {}
+            r_updates: list[dict] = []
+            r_new: dict[str, dict] = {}
 
             for item in related_enriched:
                 if r_created >= add_cap:
                     break
 
                 h = (item.get("handle") or "").lower().lstrip("@")
-                if not h:
+                if not h or h in r_new:
                     continue
 
-                existing = db.query(Creator).filter(Creator.handle == h).first()
-                if existing:
+                existing_id = existing_ids.get(h)
+                if existing_id:
+                    values = {
+                        "id": existing_id,
+                        "is_brand": bool(item.get("is_brand", False)),
+                        "is_spam": bool(item.get("is_spam", False)),
+                    }
                     if item.get("followers_est") is not None:
-                        existing.followers_est = item["followers_est"]
+                        values["followers_est"] = item["followers_est"]
                     if item.get("posts_count") is not None:
-                        existing.posts_count = item["posts_count"]
-                    existing.is_brand = bool(item.get("is_brand", False))
-                    existing.is_spam = bool(item.get("is_spam", False))
+                        values["posts_count"] = item["posts_count"]
+                    r_updates.append(values)
                     r_updated += 1
                     continue
 
@@ -278,18 +354,36 @@ async def discover_from_hashtags(db: Session, limit: int = 200, rotate: int = 4)
                     posts_count=item.get("posts_count"),
                     is_brand=bool(item.get("is_brand", False)),
                     is_spam=bool(item.get("is_spam", False)),
-                    niche_tags="related_expansion"[:1500],
-                    notes=f"Related expansion from seeds: {', '.join(seed_handles[:5])}{'...' if len(seed_handles) > 5 else ''}",
+                    niche_tags="related_expansion",
+                    notes=related_notes,
                     created_at=datetime.utcnow(),
                     fraud_flags={},
                 )
                 fraud_score, flags = assess_fraud(c)
-                c.fraud_score = fraud_score
-                c.fraud_flags = {**(c.fraud_flags or {}), **(flags or {})}
-
-                db.add(c)
+                r_new[h] = {
+                    "handle": c.handle,
+                    "platform": c.platform,
+                    "followers_est": c.followers_est,
+                    "posts_count": c.posts_count,
+                    "is_brand": c.is_brand,
+                    "is_spam": c.is_spam,
+                    "niche_tags": c.niche_tags,
+                    "notes": c.notes,
+                    "created_at": c.created_at,
+                    "fraud_score": fraud_score,
+                    "fraud_flags": {**(c.fraud_flags or {}), **(flags or {})},
+                }
                 r_created += 1
 
+            if r_updates:
+                db.bulk_update_mappings(Creator, r_updates)
+            if r_new:
+                db.execute(
+                    pg_insert(Creator)
+                    .values(list(r_new.values()))
+                    .on_conflict_do_nothing(index_elements=[func.lower(Creator.handle)])
+                )
+
             related.update({"ok": True, "created": r_created, "updated": r_updated})
 
     return {
@@ -10,37 +10,84 @@ Strategy:
 from __future__ import annotations
 
 import asyncio
+import json
 import random
 import re
 from dataclasses import dataclass
-from typing import Iterable, Optional, Sequence
-
-from agents.scrape import fetch_page_html
-
-_RE_HANDLE = re.compile(r"@([A-Za-z0-9._]{2,30})")
-_RE_POST_SHORTCODE = re.compile(r"/p/([A-Za-z0-9_-]{5,})/")
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # regex-only parsing
+    lxml_html = None
+
+from agents.scrape import _is_login_wall, cached_fetch_page_html
+from agents.outreach.keywords import KeywordMatcher, matcher_for
+
+# The needles are pure ASCII: re.ASCII keeps \s/\d off the Unicode tables, and possessive
+# quantifiers (*+, ++, {m,n}+) are used wherever the next token can't be matched by the
+# repeated class, so a failed candidate is dropped without backtracking.
+_RE_HANDLE = re.compile(r"@([A-Za-z0-9._]{2,30}+)", re.ASCII)
+_RE_POST_SHORTCODE = re.compile(r"/p/([A-Za-z0-9_-]{5,}+)/", re.ASCII)
+_RE_OWNER_USERNAME = re.compile(r"\"owner\"\s*+:\s*+\{[^}]*\"username\"\s*+:\s*+\"([A-Za-z0-9._]{2,30}+)\"", re.ASCII)
+_RE_COAUTHORS = re.compile(r"\"coauthor_producers\"\s*+:\s*+\[(.*?)\]", flags=re.DOTALL | re.ASCII)
+_RE_USERNAME = re.compile(r"\"username\"\s*+:\s*+\"([A-Za-z0-9._]{2,30}+)\"", re.ASCII)
+
+# All profile fields in one scan: counts for the edge_* fields, JSON strings (escapes
+# allowed) for biography / external_url. The first occurrence of each field wins.
+_RE_PROFILE_FIELDS = re.compile(
+    r'"(edge_followed_by|edge_owner_to_timeline_media|biography|external_url)"\s*+:\s*+'
+    r'(?:\{\s*+"count"\s*+:\s*+(\d++)|"((?:[^"\\]++|\\.)*+)")',
+    re.ASCII,
+)
+
+_COUNT_FIELDS = frozenset({"edge_followed_by", "edge_owner_to_timeline_media"})
+_VERIFIED_MARKER = '"is_verified":true'
+
+def _html_doc(html: str):
+    """Parse a page once with libxml2 so callers can run several DOM queries on it.
+
+    Returns None when lxml is unavailable or the markup can't be parsed; every consumer
+    falls back to scanning the raw text in that case.
+    """
+    if lxml_html is None or not html:
+        return None
+    try:
+        return lxml_html.fromstring(html)
+    except Exception:
+        return None
 
-# Simple per-run HTML cache to avoid refetching the same url many times.
-# (This resets per process restart; that's fine for a heuristic engine.)
-_HTML_CACHE: dict[str, str] = {}
+def _post_shortcodes(html: str, doc=None) -> list[str]:
+    """Unique /p/<shortcode>/ links, read from <a href> when the DOM has any."""
+    if doc is None:
+        doc = _html_doc(html)
+    if doc is not None:
+        scs = _unique_shortcodes(
+            m.group(1) for href in doc.xpath("//a/@href") if (m := _RE_POST_SHORTCODE.search(href))
+        )
+        if scs:
+            return scs
+    # non-rendered pages only carry the links inside embedded JSON
+    return _unique_shortcodes(_RE_POST_SHORTCODE.findall(html))
+
+def _profile_json_text(html: str, doc=None) -> str:
+    """The <script> payload(s) holding the profile JSON, or the whole page if none is found."""
+    if doc is None:
+        doc = _html_doc(html)
+    if doc is not None:
+        scripts = doc.xpath('//script[contains(., "edge_followed_by")]/text()')
+        if scripts:
+            return "".join(scripts)
+    return html
 
-def _extract_profile_shortcodes(html: str, max_posts: int = 24) -> list[str]:
+def _extract_profile_shortcodes(html: str, max_posts: int = 24, doc=None) -> list[str]:
     # profile pages often contain /p/<shortcode>/ links in the rendered HTML
-    scs = _unique_shortcodes(_RE_POST_SHORTCODE.findall(html))
+    scs = _post_shortcodes(html, doc)
     if not scs:
         return []
     random.shuffle(scs)
     return scs[:max_posts]
 
-async def _cached_fetch(url: str) -> str:
-    if url in _HTML_CACHE:
-        return _HTML_CACHE[url]
-    html = await fetch_page_html(url)
-    # don't poison cache with login wall / throttling pages
-    if not _looks_like_login_wall(html):
-        _HTML_CACHE[url] = html
-    return html
-
 def _unique_handles(seq: Iterable[str]) -> list[str]:
     """Unique, normalized handles. Handles are case-insensitive on IG."""
     out: list[str] = []
@@ -80,29 +127,73 @@ class ProfileSnapshot:
     external_url: str = ""
     is_verified: bool = False
 
-def _extract_profile_snapshot(html: str, handle: str) -> ProfileSnapshot:
-    followers = None
-    posts = None
-
-    m = re.search(r"\"edge_followed_by\"\s*:\s*\{\s*\"count\"\s*:\s*(\d+)", html)
-    if m:
-        followers = _parse_intish(m.group(1))
-
-    m = re.search(r"\"edge_owner_to_timeline_media\"\s*:\s*\{\s*\"count\"\s*:\s*(\d+)", html)
-    if m:
-        posts = _parse_intish(m.group(1))
-
-    bio = ""
-    m = re.search(r"\"biography\"\s*:\s*\"(.*?)\"", html)
-    if m:
-        bio = bytes(m.group(1), "utf-8").decode("unicode_escape", errors="ignore")
+def _unescape(s: str) -> str:
+    return bytes(s, "utf-8").decode("unicode_escape", errors="ignore")
+
+# Embedded JSON objects are decoded in place: str.find locates the key, then raw_decode
+# parses exactly one object from that offset (the C scanner does the brace/string
+# balancing and the unescaping). Regexes remain the fallback for other page shapes.
+_JSON = json.JSONDecoder()
+_JSON_MAX_TRIES = 8
+
+def _embedded_object(text: str, key: str, required: str) -> Optional[dict]:
+    """First JSON object stored under `"key":{` in text that has the `required` field."""
+    needle = f'"{key}":{{'
+    i = text.find(needle)
+    tries = 0
+    while i >= 0 and tries < _JSON_MAX_TRIES:
+        tries += 1
+        try:
+            obj, _ = _JSON.raw_decode(text, i + len(needle) - 1)
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict) and required in obj:
+            return obj
+        i = text.find(needle, i + len(needle))
+    return None
+
+def _owner_username(post_html: str) -> Optional[str]:
+    owner = _embedded_object(post_html, "owner", "username")
+    if owner is not None and isinstance(owner.get("username"), str):
+        return owner["username"]
+    m = _RE_OWNER_USERNAME.search(post_html)
+    return m.group(1) if m else None
+
+def _count(obj: dict, field: str) -> Optional[int]:
+    edge = obj.get(field)
+    return _parse_intish(edge.get("count")) if isinstance(edge, dict) else None
+
+def _extract_profile_snapshot(html: str, handle: str, doc=None) -> ProfileSnapshot:
+    # only the profile <script> block is scanned when the page parses
+    text = _profile_json_text(html, doc)
+
+    user = _embedded_object(text, "user", "edge_followed_by")
+    if user is not None:
+        return ProfileSnapshot(
+            handle=handle,
+            followers=_count(user, "edge_followed_by"),
+            posts=_count(user, "edge_owner_to_timeline_media"),
+            bio=user.get("biography") or "",
+            external_url=user.get("external_url") or "",
+            is_verified=bool(user.get("is_verified")),
+        )
 
-    external_url = ""
-    m = re.search(r"\"external_url\"\s*:\s*\"(.*?)\"", html)
-    if m:
-        external_url = bytes(m.group(1), "utf-8").decode("unicode_escape", errors="ignore")
+    fields: dict[str, str] = {}
+    for m in _RE_PROFILE_FIELDS.finditer(text):
+        name = m.group(1)
+        if name in fields:
+            continue
+        value = m.group(2) if name in _COUNT_FIELDS else m.group(3)
+        if value is None:
+            continue
+        fields[name] = value
+        if len(fields) == 4:
+            break
 
-    is_verified = "\"is_verified\":true" in html
+    followers = _parse_intish(fields["edge_followed_by"]) if "edge_followed_by" in fields else None
+    posts = _parse_intish(fields["edge_owner_to_timeline_media"]) if "edge_owner_to_timeline_media" in fields else None
+    bio = _unescape(fields["biography"]) if "biography" in fields else ""
+    external_url = _unescape(fields["external_url"]) if "external_url" in fields else ""
 
     return ProfileSnapshot(
         handle=handle,
@@ -110,37 +201,94 @@ def _extract_profile_snapshot(html: str, handle: str) -> ProfileSnapshot:
         posts=posts,
         bio=bio,
         external_url=external_url,
-        is_verified=is_verified,
+        is_verified=html.find(_VERIFIED_MARKER) >= 0,
     )
 
 
+_SPAM_HANDLE_TERMS = KeywordMatcher(["giveaway", "promo", "free", "forex", "crypto"])
+_SPAM_BIO_TERMS = KeywordMatcher([
+    "dm for promo", "dm for collab", "free money", "forex", "crypto",
+    "betting", "giveaway", "cashapp", "onlyfans", "telegram",
+])
+_BRAND_URL_HINTS = KeywordMatcher(["shop", "order", "store", "website"])
+_BRAND_SELL_TERMS = KeywordMatcher(["shop", "store", "order"])
+_BRAND_COMMERCE_TERMS = KeywordMatcher(["link in bio", "shipping"])
+
+
 def _is_spammy(handle: str, bio: str) -> bool:
-    h = handle.lower()
-    b = (bio or "").lower()
-    spam_terms = [
-        "dm for promo", "dm for collab", "free money", "forex", "crypto",
-        "betting", "giveaway", "cashapp", "onlyfans", "telegram",
-    ]
-    if any(t in h for t in ["giveaway", "promo", "free", "forex", "crypto"]):
-        return True
-    if any(t in b for t in spam_terms):
-        return True
-    return False
+    return _SPAM_HANDLE_TERMS.any(handle) or _SPAM_BIO_TERMS.any(bio)
 
 
 def _looks_like_brand(bio: str, external_url: str) -> bool:
-    b = (bio or "").lower()
-    if external_url and any(t in b for t in ["shop", "order", "store", "website"]):
-        return True
-    if ("shop" in b or "store" in b or "order" in b) and ("link in bio" in b or "shipping" in b):
+    if external_url and _BRAND_URL_HINTS.any(bio):
         return True
-    return False
+    return _BRAND_SELL_TERMS.any(bio) and _BRAND_COMMERCE_TERMS.any(bio)
+
+
+class ExcludeRules(NamedTuple):
+    """targeting.yaml exclude lists: substrings of the handle / of the bio."""
+    handle: KeywordMatcher
+    text: KeywordMatcher
+
+
+def compile_exclude_rules(cfg: dict) -> ExcludeRules:
+    """Build the exclude matchers once per run; each check is then a single pass over the string."""
+    ex = (((cfg.get("instagram") or {}).get("exclude")) or {})
+    return ExcludeRules(
+        handle=matcher_for(tuple(str(x) for x in ex.get("handle_contains") or [] if x)),
+        text=matcher_for(tuple(str(x) for x in ex.get("text_contains") or [] if x)),
+    )
+
+
+def excluded_by_rules(handle: str, text: str, rules: ExcludeRules) -> tuple[bool, str | None]:
+    if rules.handle.any(handle):
+        return True, "handle_excluded"
+    if rules.text.any(text):
+        return True, "text_excluded"
+    return False, None
 
 
 def _looks_like_login_wall(html: str) -> bool:
-    lower = (html or "").lower()
-    # best-effort signals
-    return ("login" in lower and "password" in lower and "instagram" in lower) or ("please wait a few minutes" in lower)
+    # best-effort signals; shared with the fetcher, which never lowercases whole pages
+    return _is_login_wall(html or "")
+
+# Page parsing (multi-MB regex scans, lxml, JSON decoding) runs in worker threads via
+# asyncio.to_thread: the crawl shares the process's background loop with every other
+# task's browser, HTTP and LLM I/O.
+
+def _page_shortcodes(html: str, max_posts: int | None = None) -> list[str]:
+    """Post shortcodes on a hashtag page (all) or profile page (first max_posts)."""
+    if _looks_like_login_wall(html):
+        return []
+    if max_posts is None:
+        return _post_shortcodes(html)
+    return _extract_profile_shortcodes(html, max_posts=max_posts)
+
+def _post_handles(post_html: str, prefer_mentions: bool, coauthors: bool = False) -> list[str]:
+    """Owner, @mentions and (optionally) collab coauthors of a post page."""
+    if _looks_like_login_wall(post_html):
+        return []
+
+    found: list[str] = []
+
+    # owner username
+    owner = _owner_username(post_html)
+    if owner:
+        found.append(owner)
+
+    # mentions in caption / page
+    if prefer_mentions:
+        found.extend(_RE_HANDLE.findall(post_html))
+
+    # collab posts: coauthor_producers usernames (best-effort)
+    # "coauthor_producers":[{"username":"foo"}, {"username":"bar"}]
+    # Keep this permissive: sometimes whitespace/newlines
+    if coauthors:
+        m2 = _RE_COAUTHORS.search(post_html)
+        if m2:
+            found.extend(_RE_USERNAME.findall(m2.group(1)))
+
+    return found
 
 
 async def discover_handles(
@@ -162,67 +310,64 @@ async def discover_handles(
     seen_posts: set[str] = set()
     sem = asyncio.Semaphore(max_concurrency)
 
+    def _enough() -> bool:
+        return len(handles) >= max_total_handles
+
     async def _fetch_post_handles(sc: str) -> list[str]:
-        if sc in seen_posts:
+        if sc in seen_posts or _enough():
             return []
         seen_posts.add(sc)
 
         post_url = f"https://www.instagram.com/p/{sc}/"
         async with sem:
-            post_html = await _cached_fetch(post_url)
+            # the quota may have been met while this task waited for a slot
+            if _enough():
+                return []
+            post_html = await cached_fetch_page_html(post_url)
 
-        if _looks_like_login_wall(post_html):
-            return []
+        return await asyncio.to_thread(_post_handles, post_html, prefer_mentions)
 
-        found: list[str] = []
-
-        # owner username
-        m = re.search(
-            r"\"owner\"\s*:\s*\{[^}]*\"username\"\s*:\s*\"([A-Za-z0-9._]{2,30})\"",
-            post_html,
-        )
-        if m:
-            found.append(m.group(1))
-
-        # mentions in caption / page
-        if prefer_mentions:
-            found.extend(_RE_HANDLE.findall(post_html))
-
-        return found
-
-    for tag in seed_hashtags:
+    async def _crawl_tag(tag: str) -> None:
         tag = (tag or "").strip().lstrip("#")
-        if not tag:
-            continue
+        if not tag or _enough():
+            return
 
         hashtag_url = f"https://www.instagram.com/explore/tags/{tag}/"
         async with sem:
-            html = await _cached_fetch(hashtag_url)
-
-        if _looks_like_login_wall(html):
-            continue
+            if _enough():
+                return
+            html = await cached_fetch_page_html(hashtag_url)
 
         # Pull more than needed, then shuffle to avoid always top posts
-        shortcodes = _unique_shortcodes(_RE_POST_SHORTCODE.findall(html))
+        shortcodes = await asyncio.to_thread(_page_shortcodes, html)
         if not shortcodes:
-            continue
+            return
 
         random.shuffle(shortcodes)
         shortcodes = shortcodes[:per_hashtag_posts]
 
-        tasks = [_fetch_post_handles(sc) for sc in shortcodes]
-        for fut in asyncio.as_completed(tasks):
-            try:
-                found = await fut
-            except Exception:
-                continue
-
-            handles.extend(found)
-            if len(handles) >= max_total_handles:
-                break
-
-        if len(handles) >= max_total_handles:
-            break
+        tasks = [asyncio.create_task(_fetch_post_handles(sc)) for sc in shortcodes]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    found = await fut
+                except Exception:
+                    continue
+
+                handles.extend(found)
+                if _enough():
+                    break
+        finally:
+            # quota met (here or by another tag): stop page loads that are still queued or running
+            # (a shared fetch is cancelled once its last waiter is)
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # All tags crawl concurrently; the shared semaphore still caps in-flight page loads
+    # and `handles` is only touched from this event loop, so no locking is needed.
+    await asyncio.gather(*(_crawl_tag(t) for t in seed_hashtags), return_exceptions=True)
 
     return _unique_handles(handles)[:max_total_handles]
 
@@ -249,7 +394,7 @@ async def discover_related_handles(
     async def _fetch(url: str) -> str:
         # bounded concurrency + shared cache
         async with sem:
-            return await _cached_fetch(url)
+            return await cached_fetch_page_html(url)
 
     async def _crawl_seed(seed: str) -> list[str]:
         seed = (seed or "").strip().lstrip("@").lower()
@@ -262,10 +407,7 @@ async def discover_related_handles(
         except Exception:
             return []
 
-        if _looks_like_login_wall(prof_html):
-            return []
-
-        shortcodes = _extract_profile_shortcodes(prof_html, max_posts=per_seed_posts)
+        shortcodes = await asyncio.to_thread(_page_shortcodes, prof_html, per_seed_posts)
         if not shortcodes:
             return []
 
@@ -283,28 +425,7 @@ async def discover_related_handles(
             except Exception:
                 continue
 
-            if _looks_like_login_wall(post_html):
-                continue
-
-            # owner username
-            m = re.search(
-                r"\"owner\"\s*:\s*\{[^}]*\"username\"\s*:\s*\"([A-Za-z0-9._]{2,30})\"",
-                post_html,
-            )
-            if m:
-                found.append(m.group(1))
-
-            # mentions in caption / page
-            if prefer_mentions:
-                found.extend(_RE_HANDLE.findall(post_html))
-
-            # collab posts: coauthor_producers usernames (best-effort)
-            # "coauthor_producers":[{"username":"foo"}, {"username":"bar"}]
-            # Keep this permissive: sometimes whitespace/newlines
-            m2 = re.search(r"\"coauthor_producers\"\s*:\s*\[(.*?)\]", post_html, flags=re.DOTALL)
-            if m2:
-                block = m2.group(1)
-                found.extend(re.findall(r"\"username\"\s*:\s*\"([A-Za-z0-9._]{2,30})\"", block))
+            found.extend(await asyncio.to_thread(_post_handles, post_html, prefer_mentions, True))
 
             if len(found) >= max_total_handles:
                 break
@@ -312,15 +433,21 @@ async def discover_related_handles(
         return found
 
     # Crawl seeds concurrently
-    tasks = [_crawl_seed(h) for h in _unique_handles(seed_handles)]
-    for fut in asyncio.as_completed(tasks):
-        try:
-            found = await fut
-        except Exception:
-            continue
-        handles.extend(found)
-        if len(handles) >= max_total_handles:
-            break
+    tasks = [asyncio.create_task(_crawl_seed(h)) for h in _unique_handles(seed_handles)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            try:
+                found = await fut
+            except Exception:
+                continue
+            handles.extend(found)
+            if len(handles) >= max_total_handles:
+                break
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     return _unique_handles(handles)[:max_total_handles]
 
@@ -332,6 +459,7 @@ async def enrich_and_filter(
     hard_max_followers: int = 250_000,
     include_excluded: bool = False,
     max_concurrency: int = 6,
+    exclude_rules: Optional[ExcludeRules] = None,
 ) -> list[dict]:
     out: list[dict] = []
     sem = asyncio.Semaphore(max_concurrency)
@@ -345,17 +473,20 @@ async def enrich_and_filter(
     async def _enrich_one(h: str) -> Optional[dict]:
         profile_url = f"https://www.instagram.com/{h}/"
         async with sem:
-            html = await _cached_fetch(profile_url)
+            html = await cached_fetch_page_html(profile_url)
 
         if _looks_like_login_wall(html):
             return None
 
-        snap = _extract_profile_snapshot(html, h)
+        snap = await asyncio.to_thread(_extract_profile_snapshot, html, h)
 
         followers = snap.followers or 0
         is_spam = _is_spammy(h, snap.bio)
         is_brand = _looks_like_brand(snap.bio, snap.external_url)
         is_mega = followers >= hard_max_followers
+        rule_hit, rule_reason = (
+            excluded_by_rules(h, snap.bio, exclude_rules) if exclude_rules is not None else (False, None)
+        )
 
         excluded = False
         exclude_reason = ""
@@ -365,6 +496,9 @@ async def enrich_and_filter(
         elif is_brand:
             excluded = True
             exclude_reason = "brand_account"
+        elif rule_hit:
+            excluded = True
+            exclude_reason = rule_reason
         elif is_mega:
             excluded = True
             exclude_reason = "mega_account"
@@ -0,0 +1,36 @@
+"""Shared @handle pattern for discovery and the creator graph.
+
+Compiled once at import (with google-re2 when installed, for linear-time scans of large
+scraped pages) so every caller uses the same pattern.
+"""
+
+from __future__ import annotations
+
+import re
+
+try:
+    import re2 as _re
+except ImportError:
+    _re = re
+
+HANDLE_RE = _re.compile(r"@([A-Za-z0-9_\.]{2,30})")
+
+
+def extract_handles(text: str) -> list[str]:
+    """Unique lowercase handles in order of first appearance."""
+    if not text:
+        return []
+    # memchr for the first "@": pages without mentions never reach the regex
+    start = text.find("@")
+    if start < 0:
+        return []
+    # de-dupe in the same pass, preserve order (the capture group excludes the "@")
+    seen = set()
+    out = []
+    for m in HANDLE_RE.finditer(text, start):
+        h = m.group(1).lower()
+        if len(h) < 2 or h in seen:
+            continue
+        seen.add(h)
+        out.append(h)
+    return out
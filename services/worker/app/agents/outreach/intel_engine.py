@@ -1,12 +1,19 @@
 from __future__ import annotations
+import asyncio
+import functools
 import re
+from collections import defaultdict
 from datetime import datetime, timedelta, date
+from typing import NamedTuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from db_models import Creator, CreatorMetricsDaily, CreatorSignal
-from agents.outreach.discovery_engine import _extract_profile_snapshot, _extract_profile_shortcodes, _RE_POST_SHORTCODE
-from agents.scrape import fetch_page_html
+from agents.outreach.discovery_engine import _extract_profile_snapshot, _extract_profile_shortcodes, _html_doc, _RE_POST_SHORTCODE
+from agents.aio import run_async
+from agents.scrape import cached_fetch_page_html
+from agents.outreach.keywords import matcher_for
 
 _HASHTAG_RE = re.compile(r"#([A-Za-z0-9_]{2,50})")
 
@@ -20,42 +27,74 @@ DEFAULT_NICHE_KEYWORDS = [
     "black owned","black-owned","plant based","plantbased","faith","christian",
 ]
 
-def _normalize(txt: str) -> str:
-    return (txt or "").lower()
-
 def _keyword_score(text: str, keywords: list[str]) -> float:
-    t = _normalize(text)
-    score = 0.0
-    for kw in keywords:
-        if kw in t:
-            # longer phrases get slightly more weight
-            score += 1.0 + min(1.0, len(kw) / 20.0)
-    return score
-
-async def snapshot_creator(db: Session, creator: Creator) -> None:
-    """Fetch profile html, store a daily snapshot row (for growth)."""
-    url = f"https://www.instagram.com/{creator.handle}/"
-    html = await fetch_page_html(url)
-    snap = _extract_profile_snapshot(html, creator.handle)
+    # every keyword found in a single pass over the text
+    return matcher_for(tuple(keywords)).score(text)
 
-    today = date.today()
-    row = (
-        db.query(CreatorMetricsDaily)
-        .filter(CreatorMetricsDaily.creator_id == creator.id)
-        .filter(CreatorMetricsDaily.snapshot_date == today)
-        .first()
+@functools.lru_cache(maxsize=64)
+def _hashtag_keywords(keywords: tuple[str, ...]):
+    # hashtags never contain spaces, so multi-word phrases can't match one; an exact
+    # single-word hit is a set lookup and only the rest need the substring matcher
+    words = tuple(k.lower() for k in keywords if " " not in k)
+    return frozenset(words), matcher_for(words)
+
+def _hashtag_hits(hashtags: list[str], keywords: list[str]) -> int:
+    """Number of hashtags (repeats included) that contain a niche keyword."""
+    exact, matcher = _hashtag_keywords(tuple(keywords))
+    seen: dict[str, bool] = {}
+    hits = 0
+    for h in hashtags:
+        t = h.lower()
+        hit = seen.get(t)
+        if hit is None:
+            hit = seen[t] = t in exact or matcher.any(t)
+        hits += hit
+    return hits
+
+class CreatorPages(NamedTuple):
+    """A creator's profile page (parsed once) and its recent post pages by shortcode."""
+    url: str
+    html: str
+    doc: object
+    posts: dict[str, str]
+
+
+async def _fetch_posts(shortcodes: list[str]) -> dict[str, str]:
+    urls = [f"https://www.instagram.com/p/{sc}/" for sc in shortcodes]
+    pages = await asyncio.gather(*(cached_fetch_page_html(u) for u in urls), return_exceptions=True)
+    # a post that fails to load is skipped, as before
+    return {sc: html for sc, html in zip(shortcodes, pages) if isinstance(html, str)}
+
+
+def load_creator_pages(handle: str, *, posts_to_scan: int = 8, timeout: float | None = None) -> CreatorPages:
+    """
+    Fetch a creator's profile and recent posts. Only the page loads go to the shared
+    background loop (each bounded by `timeout`); parsing stays in the calling thread.
+    """
+    url = f"https://www.instagram.com/{handle}/"
+    html = run_async(cached_fetch_page_html(url), timeout=timeout)
+    doc = _html_doc(html)
+    shortcodes = _extract_profile_shortcodes(html, max_posts=posts_to_scan, doc=doc)
+    posts = run_async(_fetch_posts(shortcodes), timeout=timeout) if shortcodes else {}
+    return CreatorPages(url, html, doc, posts)
+
+
+def snapshot_creator(db: Session, creator: Creator, pages: CreatorPages) -> None:
+    """Store a daily snapshot row (for growth) from the profile page."""
+    snap = _extract_profile_snapshot(pages.html, creator.handle, pages.doc)
+
+    # one round-trip: insert today's snapshot or refresh it
+    stmt = pg_insert(CreatorMetricsDaily).values(
+        creator_id=creator.id,
+        snapshot_date=date.today(),
+        followers_est=snap.followers,
+        posts_count=snap.posts,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_creator_metrics_daily",
+        set_={"followers_est": stmt.excluded.followers_est, "posts_count": stmt.excluded.posts_count},
     )
-    if not row:
-        row = CreatorMetricsDaily(
-            creator_id=creator.id,
-            snapshot_date=today,
-            followers_est=snap.followers,
-            posts_count=snap.posts,
-        )
-        db.add(row)
-    else:
-        row.followers_est = snap.followers
-        row.posts_count = snap.posts
+    db.execute(stmt)
 
 def _growth_pct(new: int | None, old: int | None) -> float | None:
     if not new or not old or old <= 0:
@@ -68,132 +107,159 @@ def update_growth_fields(db: Session, creator: Creator) -> None:
     d7 = today - timedelta(days=7)
     d30 = today - timedelta(days=30)
 
-    newest = (
-        db.query(CreatorMetricsDaily)
-        .filter(CreatorMetricsDaily.creator_id == creator.id)
-        .order_by(CreatorMetricsDaily.snapshot_date.desc())
-        .first()
-    )
-    if not newest:
-        creator.growth_7d = None
-        creator.growth_30d = None
-        return
-
-    s7 = (
-        db.query(CreatorMetricsDaily)
-        .filter(CreatorMetricsDaily.creator_id == creator.id)
-        .filter(CreatorMetricsDaily.snapshot_date <= d7)
-        .order_by(CreatorMetricsDaily.snapshot_date.desc())
-        .first()
-    )
-    s30 = (
-        db.query(CreatorMetricsDaily)
-        .filter(CreatorMetricsDaily.creator_id == creator.id)
-        .filter(CreatorMetricsDaily.snapshot_date <= d30)
-        .order_by(CreatorMetricsDaily.snapshot_date.desc())
-        .first()
-    )
+    def _followers_on_or_before(day: date | None):
+        q = select(CreatorMetricsDaily.followers_est).where(CreatorMetricsDaily.creator_id == creator.id)
+        if day is not None:
+            q = q.where(CreatorMetricsDaily.snapshot_date <= day)
+        return q.order_by(CreatorMetricsDaily.snapshot_date.desc()).limit(1).scalar_subquery()
 
-    creator.growth_7d = _growth_pct(newest.followers_est, s7.followers_est) if s7 else None
-    creator.growth_30d = _growth_pct(newest.followers_est, s30.followers_est) if s30 else None
+    # newest / 7d-ago / 30d-ago followers in a single statement (a missing snapshot and a
+    # missing follower count both mean "no growth figure")
+    newest, f7, f30 = db.execute(
+        select(_followers_on_or_before(None), _followers_on_or_before(d7), _followers_on_or_before(d30))
+    ).one()
 
-async def compute_niche_signals(
+    creator.growth_7d = _growth_pct(newest, f7)
+    creator.growth_30d = _growth_pct(newest, f30)
+
+def compute_niche_signals(
     db: Session,
     creator: Creator,
+    pages: CreatorPages,
     *,
     keywords: list[str] = DEFAULT_NICHE_KEYWORDS,
-    posts_to_scan: int = 8,
 ) -> float:
     """Scan bio + recent posts for niche keywords and hashtags. Store evidence rows; return niche_score."""
-    profile_url = f"https://www.instagram.com/{creator.handle}/"
-    prof_html = await fetch_page_html(profile_url)
-    snap = _extract_profile_snapshot(prof_html, creator.handle)
-
-    # Clear older signals for this creator (keep it simple)
-    db.query(CreatorSignal).filter(CreatorSignal.creator_id == creator.id).delete()
+    profile_url = pages.url
+    snap = _extract_profile_snapshot(pages.html, creator.handle, pages.doc)
 
     score = 0.0
+    # evidence rows are collected here and written in one executemany at the end;
+    # (signal_type, source_url) keeps a post from being recorded twice
+    rows: list[dict] = []
+    seen: set[tuple[str, str]] = set()
+
+    def _signal(signal_type: str, text: str, weight: float, url: str) -> None:
+        if (signal_type, url) in seen:
+            return
+        seen.add((signal_type, url))
+        rows.append({
+            "creator_id": creator.id,
+            "signal_type": signal_type,
+            "signal_text": text,
+            "weight": float(weight),
+            "source_url": url,
+        })
 
     # BIO signal
     bio_score = _keyword_score(snap.bio, keywords)
     if bio_score > 0:
-        db.add(CreatorSignal(
-            creator_id=creator.id,
-            signal_type="bio",
-            signal_text=snap.bio[:1200],
-            weight=float(bio_score),
-            source_url=profile_url,
-        ))
+        _signal("bio", snap.bio[:1200], bio_score, profile_url)
         score += bio_score * 1.5  # bio is strong intent
 
-    # RECENT POSTS: extract shortcodes from profile HTML then crawl posts
-    shortcodes = _extract_profile_shortcodes(prof_html, max_posts=posts_to_scan)
-    for sc in shortcodes:
+    # RECENT POSTS (shortcodes from the profile HTML, fetched by load_creator_pages)
+    for sc, post_html in pages.posts.items():
         post_url = f"https://www.instagram.com/p/{sc}/"
-        try:
-            post_html = await fetch_page_html(post_url)
-        except Exception:
-            continue
-
         # crude: search page for captions/hashtags/keywords
         post_score = _keyword_score(post_html, keywords)
         hashtags = _HASHTAG_RE.findall(post_html)
-        hashtag_score = 0.0
-        for h in hashtags:
-            if _keyword_score(h, keywords) > 0:
-                hashtag_score += 0.5
+        hashtag_score = 0.5 * _hashtag_hits(hashtags, keywords)
 
         if post_score > 0:
-            db.add(CreatorSignal(
-                creator_id=creator.id,
-                signal_type="post",
-                signal_text=f"Matched keywords on post {sc}",
-                weight=float(post_score),
-                source_url=post_url,
-            ))
+            _signal("post", f"Matched keywords on post {sc}", post_score, post_url)
             score += post_score
 
         if hashtag_score > 0:
-            db.add(CreatorSignal(
-                creator_id=creator.id,
-                signal_type="hashtag",
-                signal_text=", ".join(hashtags[:25]),
-                weight=float(hashtag_score),
-                source_url=post_url,
-            ))
+            _signal("hashtag", ", ".join(hashtags[:25]), hashtag_score, post_url)
             score += hashtag_score
 
+    # Replace older signals for this creator (keep it simple)
+    db.query(CreatorSignal).filter(CreatorSignal.creator_id == creator.id).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(CreatorSignal), rows)
+
     return float(score)
 
-def lexical_similarity(a: str, b: str) -> float:
-    """Always-works similarity (no embeddings)."""
-    a = set(re.findall(r"[a-z0-9]{3,}", (a or "").lower()))
-    b = set(re.findall(r"[a-z0-9]{3,}", (b or "").lower()))
+_TOKEN_RE = re.compile(r"[a-z0-9]{3,}")
+
+def _tokens(text: str) -> frozenset[str]:
+    return frozenset(_TOKEN_RE.findall((text or "").lower()))
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
     if not a or not b:
         return 0.0
-    return len(a & b) / float(len(a | b))
+    inter = len(a & b)
+    return inter / float(len(a) + len(b) - inter)
+
+def lexical_similarity(a: str, b: str) -> float:
+    """Always-works similarity (no embeddings)."""
+    return _jaccard(_tokens(a), _tokens(b))
+
+class PartnerIndex(NamedTuple):
+    """Inverted index over partner corpora: token -> partner positions, plus corpus sizes."""
+    postings: dict[str, list[int]]
+    sizes: list[int]
+
+
+def _signal_text(db: Session, ids: set[int]) -> dict[int, list[str]]:
+    sig_text: dict[int, list[str]] = defaultdict(list)
+    for creator_id, text in (
+        db.query(CreatorSignal.creator_id, CreatorSignal.signal_text)
+        .filter(CreatorSignal.creator_id.in_(ids))
+        .all()
+    ):
+        sig_text[creator_id].append(text or "")
+    return sig_text
+
+
+def _corpus(c: Creator, sig_text: dict[int, list[str]]) -> frozenset[str]:
+    return _tokens(" ".join([
+        c.handle or "",
+        c.niche_tags or "",
+        c.notes or "",
+        " ".join(sig_text.get(c.id, ())),
+    ]))
+
 
-def best_partner_similarity(db: Session, creator: Creator) -> float:
+def build_partner_index(db: Session) -> PartnerIndex | None:
+    """Tokenize every partner once; reuse the result for a whole batch of creators."""
+    partners = db.query(Creator).filter(Creator.is_partner.is_(True)).limit(50).all()
+    if not partners:
+        return None
+    sig_text = _signal_text(db, {p.id for p in partners})
+    postings: dict[str, list[int]] = defaultdict(list)
+    sizes: list[int] = []
+    for k, p in enumerate(partners):
+        toks = _corpus(p, sig_text)
+        sizes.append(len(toks))
+        for t in toks:
+            postings[t].append(k)
+    return PartnerIndex(dict(postings), sizes)
+
+
+def best_partner_similarity(db: Session, creator: Creator, index: PartnerIndex | None = None) -> float:
     """
     Compare this creator against the set you mark as is_partner=True.
     Uses Creator.notes/niche_tags + signal text as the corpus.
+
+    Pass a build_partner_index() result when scoring many creators; otherwise the partner
+    corpora are loaded for this call alone.
     """
-    partners = db.query(Creator).filter(Creator.is_partner.is_(True)).limit(50).all()
-    if not partners:
-        return 0.0
+    if index is None:
+        index = build_partner_index(db)
+        if index is None:
+            return 0.0
 
-    def corpus(c: Creator) -> str:
-        sigs = db.query(CreatorSignal).filter(CreatorSignal.creator_id == c.id).all()
-        sig_txt = " ".join((s.signal_text or "") for s in sigs)
-        return " ".join([
-            c.handle or "",
-            c.niche_tags or "",
-            c.notes or "",
-            sig_txt,
-        ])
-
-    me = corpus(creator)
-    best = 0.0
-    for p in partners:
-        best = max(best, lexical_similarity(me, corpus(p)))
-    return best
\ No newline at end of file
+    me = _corpus(creator, _signal_text(db, {creator.id}))
+    if not me:
+        return 0.0
+    # intersection sizes for every partner at once by walking only my tokens' postings
+    inter = [0] * len(index.sizes)
+    for t in me:
+        for k in index.postings.get(t, ()):
+            inter[k] += 1
+    n = len(me)
+    return max(
+        (i / float(n + size - i) for i, size in zip(inter, index.sizes) if i),
+        default=0.0,
+    )
@@ -0,0 +1,80 @@
+"""Multi-keyword substring matching.
+
+One pass over the text finds every keyword it contains (Aho-Corasick via pyahocorasick
+when installed, otherwise a single lookahead regex), instead of one `kw in text` scan per
+keyword. Matching is case-insensitive and each keyword counts once per text.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from typing import Iterable
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def keyword_weight(kw: str) -> float:
+    # longer phrases get slightly more weight
+    return 1.0 + min(1.0, len(kw) / 20.0)
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(k.lower() for k in keywords if k))
+        self._automaton = None
+        self._regex = None
+        self._prefixes: dict[str, tuple[str, ...]] = {}
+
+        if not self.keywords:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for kw in self.keywords:
+                self._automaton.add_word(kw, kw)
+            self._automaton.make_automaton()
+        else:
+            # zero-width lookahead reports a match at every start offset (overlaps included);
+            # longest-first alternation picks the longest keyword at each offset, and the
+            # prefix table recovers shorter keywords that start at the same offset
+            ordered = sorted(self.keywords, key=len, reverse=True)
+            self._regex = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))")
+            self._prefixes = {
+                kw: tuple(k for k in self.keywords if k != kw and kw.startswith(k))
+                for kw in self.keywords
+            }
+
+    def matches(self, text: str | None) -> set[str]:
+        """Distinct keywords contained in text."""
+        if not text or not self.keywords:
+            return set()
+        t = text.lower()
+        if self._automaton is not None:
+            return {kw for _, kw in self._automaton.iter(t)}
+        found: set[str] = set()
+        for m in self._regex.finditer(t):
+            kw = m.group(1)
+            if kw not in found:
+                found.add(kw)
+                found.update(self._prefixes[kw])
+        return found
+
+    def any(self, text: str | None) -> bool:
+        if not text or not self.keywords:
+            return False
+        t = text.lower()
+        if self._automaton is not None:
+            return next(self._automaton.iter(t), None) is not None
+        return self._regex.search(t) is not None
+
+    def score(self, text: str | None) -> float:
+        return sum(keyword_weight(kw) for kw in self.matches(text))
+
+
+@functools.lru_cache(maxsize=64)
+def matcher_for(keywords: tuple[str, ...]) -> KeywordMatcher:
+    """Shared matcher per keyword tuple (build cost is paid once per process)."""
+    return KeywordMatcher(keywords)
@@ -9,43 +9,81 @@ This powers: finding more creators like your winners.
 
 from __future__ import annotations
 
+import bisect
+import functools
 
-def _tag_set(niche_tags: str | None) -> set[str]:
+
+@functools.lru_cache(maxsize=4096)
+def _tag_set(niche_tags: str | None) -> frozenset[str]:
+    # memoized: the same niche_tags strings are compared many times in a sweep
     if not niche_tags:
-        return set()
-    parts = [p.strip().lower() for p in niche_tags.split(",")]
-    return {p for p in parts if p}
+        return frozenset()
+    parts = (p.strip().lower() for p in niche_tags.split(","))
+    return frozenset(p for p in parts if p)
 
 
-def jaccard_tags(a_tags: str | None, b_tags: str | None) -> float:
-    a = _tag_set(a_tags)
-    b = _tag_set(b_tags)
+def _jaccard_sets(a: frozenset[str], b: frozenset[str]) -> float:
     if not a or not b:
         return 0.0
-    inter = a.intersection(b)
-    union = a.union(b)
-    return float(len(inter)) / float(len(union) or 1)
+    inter = len(a & b)
+    return float(inter) / float((len(a) + len(b) - inter) or 1)
+
+
+def jaccard_tags(a_tags: str | None, b_tags: str | None) -> float:
+    return _jaccard_sets(_tag_set(a_tags), _tag_set(b_tags))
+
+
+# bucket i covers [_FOLLOWER_THRESHOLDS[i-1], _FOLLOWER_THRESHOLDS[i])
+_FOLLOWER_THRESHOLDS = (5_000, 20_000, 80_000, 250_000)
+_FOLLOWER_BUCKETS = ("micro", "micro+", "mid", "large", "mega")
 
 
 def follower_bucket(followers: int | None) -> str:
     if followers is None:
         return "unknown"
-    if followers < 5_000:
-        return "micro"
-    if followers < 20_000:
-        return "micro+"
-    if followers < 80_000:
-        return "mid"
-    if followers < 250_000:
-        return "large"
-    return "mega"
+    return _FOLLOWER_BUCKETS[bisect.bisect_right(_FOLLOWER_THRESHOLDS, followers)]
 
 
-def similarity_score(creator_a, creator_b) -> float:
-    base = jaccard_tags(getattr(creator_a, "niche_tags", None), getattr(creator_b, "niche_tags", None))
+@functools.lru_cache(maxsize=65536)
+def _pair_score(a_tags: str | None, a_bucket: str, b_tags: str | None, b_bucket: str) -> float:
+    # keyed on the inputs (not creator ids) so edited tags/followers never hit a stale entry
+    base = jaccard_tags(a_tags, b_tags)
     if base <= 0:
         return 0.0
     # small bonus if same bucket (keeps outreach strategy consistent)
-    if follower_bucket(getattr(creator_a, "followers_est", None)) == follower_bucket(getattr(creator_b, "followers_est", None)):
+    if a_bucket == b_bucket:
         base += 0.1
     return min(1.0, base)
+
+
+def similarity_score(creator_a, creator_b) -> float:
+    return _pair_score(
+        getattr(creator_a, "niche_tags", None),
+        follower_bucket(getattr(creator_a, "followers_est", None)),
+        getattr(creator_b, "niche_tags", None),
+        follower_bucket(getattr(creator_b, "followers_est", None)),
+    )
+
+
+def similarity_matrix(creators: list) -> list[list[float]]:
+    """similarity_score for every pair of creators (row i = creators[i] vs all).
+
+    Tags and buckets are computed once per creator and the matrix is symmetric, so the hot
+    loop is set arithmetic on each unordered pair only. The diagonal is 0.
+    """
+    sets = [_tag_set(getattr(c, "niche_tags", None)) for c in creators]
+    buckets = [follower_bucket(getattr(c, "followers_est", None)) for c in creators]
+    n = len(creators)
+    out = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        si, bi, row = sets[i], buckets[i], out[i]
+        if not si:
+            continue
+        for j in range(i + 1, n):
+            base = _jaccard_sets(si, sets[j])
+            if base <= 0:
+                continue
+            if bi == buckets[j]:
+                base += 0.1
+            row[j] = out[j][i] = min(1.0, base)
+    return out
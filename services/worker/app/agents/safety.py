@@ -10,6 +10,30 @@ MAX_ACTIONS_PER_HOUR = int(os.getenv("MAX_ACTIONS_PER_HOUR", "30"))
 
 r = redis.Redis.from_url(REDIS_URL)
 
+# Per-process view of the current hour's counter. Reads within COUNTER_CACHE_SECONDS reuse
+# it, except near the limit where every check goes to Redis so other workers' actions
+# are never missed at the boundary.
+COUNTER_CACHE_SECONDS = float(os.getenv("ACTION_COUNTER_CACHE_SECONDS", "1.0"))
+COUNTER_NEAR_LIMIT = int(os.getenv("ACTION_COUNTER_NEAR_LIMIT", "3"))
+_counter_cache = {"bucket": None, "value": 0, "read_at": 0.0}
+
+def _action_key(hour_bucket: int) -> str:
+    return f"actions:{hour_bucket}"
+
+def _action_count(hour_bucket: int) -> int:
+    now = time.monotonic()
+    c = _counter_cache
+    if (
+        c["bucket"] == hour_bucket
+        and now - c["read_at"] < COUNTER_CACHE_SECONDS
+        and c["value"] < MAX_ACTIONS_PER_HOUR - COUNTER_NEAR_LIMIT
+    ):
+        return c["value"]
+    count = r.get(_action_key(hour_bucket))
+    value = int(count) if count else 0
+    c.update(bucket=hour_bucket, value=value, read_at=now)
+    return value
+
 def guardrails_ok() -> bool:
     if KILL_SWITCH:
         return False
@@ -17,14 +41,21 @@ def guardrails_ok() -> bool:
         return False
     # Rate limit key per hour
     hour_bucket = int(time.time() // 3600)
-    key = f"actions:{hour_bucket}"
-    count = r.get(key)
-    if count and int(count) >= MAX_ACTIONS_PER_HOUR:
+    if _action_count(hour_bucket) >= MAX_ACTIONS_PER_HOUR:
         return False
     return True
 
+# INCRBY + EXPIRE server-side: one EVALSHA round-trip, and the key can't be left without
+# a TTL between the two commands (redis-py falls back to EVAL if the script is evicted)
+_incr_with_ttl = r.register_script(
+    "local v = redis.call('INCRBY', KEYS[1], ARGV[1]); "
+    "redis.call('EXPIRE', KEYS[1], ARGV[2]); "
+    "return v"
+)
+
 def increment_action_count(n: int = 1):
     hour_bucket = int(time.time() // 3600)
-    key = f"actions:{hour_bucket}"
-    r.incrby(key, n)
-    r.expire(key, 7200)
+    key = _action_key(hour_bucket)
+    value = _incr_with_ttl(keys=[key], args=[n, 7200])
+    _counter_cache.update(bucket=hour_bucket, value=int(value), read_at=time.monotonic())
+    return int(value)
@@ -1,54 +1,174 @@
 from __future__ import annotations
 
 import os
+import re
 from playwright.async_api import async_playwright
 
 import asyncio
+import weakref
+import zlib
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from playwright.async_api import async_playwright, Browser, BrowserContext
+
+import httpx
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/122.0.0.0 Safari/537.36"
+)
 
 # Keep one browser per process, reuse across calls
+_playwright = None
 _browser: Browser | None = None
 _context: BrowserContext | None = None
 _lock = asyncio.Lock()
 
-async def fetch_page_text(url: str, wait_ms: int = 1000) -> str:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage"]
+# Warm pages are reused across fetches (page create/close is several CDP round-trips);
+# each page is recycled after a number of navigations to cap renderer memory.
+PAGE_POOL_SIZE = int(os.getenv("SCRAPE_PAGE_POOL_SIZE", "6"))
+PAGE_MAX_USES = int(os.getenv("SCRAPE_PAGE_MAX_USES", "50"))
+_idle_pages: list[Page] = []
+_page_uses: dict[int, int] = {}
+
+_BLOCKED_RESOURCES = frozenset({"image", "media", "font"})
+
+# Fast path: IG server-renders the markers discovery needs into plain HTML often enough
+# that a raw HTTP GET beats a full Chromium render. Playwright is only used when the
+# raw page is missing them or is a login wall.
+SCRAPE_HTTP_FAST = os.getenv("SCRAPE_HTTP_FAST", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.getenv("SCRAPE_HTTP_MAX_CONNECTIONS", "32"))
+_FAST_MARKERS = ("/p/", "edge_followed_by")
+# httpx pools are bound to the loop they were first used on
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=_HTTP2,
+            headers={"User-Agent": USER_AGENT},
+            timeout=30.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
         )
-        context = await browser.new_context()
-        page = await context.new_page()
+        _http_clients[loop] = client
+    return client
+
+# Case-insensitive searches run over the page in place; lowercasing a multi-MB page first
+# would copy all of it for a handful of keyword checks. ASCII-only case folding is enough
+# for these needles and skips the Unicode case tables.
+_RE_LOGIN = re.compile("login", re.IGNORECASE | re.ASCII)
+_RE_PASSWORD = re.compile("password", re.IGNORECASE | re.ASCII)
+_RE_INSTAGRAM = re.compile("instagram", re.IGNORECASE | re.ASCII)
+_RE_THROTTLED = re.compile("please wait a few minutes", re.IGNORECASE | re.ASCII)
+
+def _is_login_wall(html: str) -> bool:
+    return bool(
+        (_RE_LOGIN.search(html) and _RE_PASSWORD.search(html) and _RE_INSTAGRAM.search(html))
+        or _RE_THROTTLED.search(html)
+    )
+
+async def _fetch_raw_html(url: str) -> str | None:
+    """Plain GET; None when the page needs a real browser."""
+    try:
+        r = await _http_client().get(url)
+    except httpx.HTTPError:
+        return None
+    if r.status_code != 200:
+        return None
+    html = r.text
+    if _is_login_wall(html) or not any(m in html for m in _FAST_MARKERS):
+        return None
+    return html
+
+async def _block_heavy(route: Route) -> None:
+    if route.request.resource_type in _BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def fetch_page_text(url: str, wait_ms: int = 1000) -> str:
+    """Visible body text of a page, rendered on the shared browser's page pool."""
+    _, context = await _ensure_browser()
+    page = await _acquire_page(context)
+    reusable = False
 
+    try:
         await page.goto(url, wait_until="domcontentloaded", timeout=60000)
         await page.wait_for_timeout(wait_ms)
 
         text = await page.inner_text("body")
-
-        await browser.close()
+        reusable = True
         return text
+    finally:
+        await _release_page(page, reusable)
 
 async def _ensure_browser() -> tuple[Browser, BrowserContext]:
-    global _browser, _context
+    global _playwright, _browser, _context
     async with _lock:
         if _browser and _context:
             return _browser, _context
 
-        p = await async_playwright().start()
-        _browser = await p.chromium.launch(
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+        _browser = await _playwright.chromium.launch(
             headless=True,
             args=["--no-sandbox", "--disable-dev-shm-usage"],
         )
-        _context = await _browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/122.0.0.0 Safari/537.36"
-            )
-        )
+        _context = await _browser.new_context(user_agent=USER_AGENT)
+        # Block heavy resources once for every page of the context
+        await _context.route("**/*", _block_heavy)
         return _browser, _context
 
+async def close_browser() -> None:
+    """Close pooled pages, the shared browser and Playwright (worker shutdown)."""
+    global _playwright, _browser, _context
+    async with _lock:
+        pages, _idle_pages[:] = list(_idle_pages), []
+        _page_uses.clear()
+        for page in pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        for closer in (_context, _browser, _playwright):
+            if closer is None:
+                continue
+            try:
+                await (closer.stop() if closer is _playwright else closer.close())
+            except Exception:
+                pass
+        _playwright, _browser, _context = None, None, None
+
+async def _acquire_page(context: BrowserContext) -> Page:
+    while _idle_pages:
+        page = _idle_pages.pop()
+        if not page.is_closed():
+            return page
+        _page_uses.pop(id(page), None)
+    return await context.new_page()
+
+async def _release_page(page: Page, reusable: bool) -> None:
+    uses = _page_uses.get(id(page), 0) + 1
+    if reusable and uses < PAGE_MAX_USES and len(_idle_pages) < PAGE_POOL_SIZE and not page.is_closed():
+        _page_uses[id(page)] = uses
+        _idle_pages.append(page)
+        return
+    _page_uses.pop(id(page), None)
+    try:
+        await page.close()
+    except Exception:
+        pass
+
 async def fetch_page_html(
     url: str,
     *,
@@ -57,18 +177,17 @@ async def fetch_page_html(
 ) -> str:
     """
     Return raw page HTML using a shared browser/context to avoid relaunching Chromium
-    on every request. Blocks images/media/fonts for speed.
+    on every request. Tries a plain HTTP GET first (SCRAPE_HTTP_FAST). Pages come from a
+    small warm pool; images/media/fonts are blocked by a context-wide route.
     """
+    if SCRAPE_HTTP_FAST:
+        html = await _fetch_raw_html(url)
+        if html is not None:
+            return html
+
     _, context = await _ensure_browser()
-    page = await context.new_page()
-
-    # Block heavy resources
-    await page.route(
-        "**/*",
-        lambda route: route.abort()
-        if route.request.resource_type in {"image", "media", "font"}
-        else route.continue_(),
-    )
+    page = await _acquire_page(context)
+    reusable = False
 
     try:
         await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
@@ -81,14 +200,76 @@ async def fetch_page_html(
             pass
 
         html = await page.content()
-        lower = html.lower()
-        if "login" in lower and "instagram" in lower and "password" in lower:
-            # login wall (best-effort)
-            return html
-        if "please wait a few minutes" in lower:
-            return html
+        reusable = True
         return html
     finally:
-        await page.close()
+        # a page that failed mid-navigation is closed rather than pooled
+        await _release_page(page, reusable)
+
+    
+# Per-process HTML cache to avoid refetching the same url many times (discovery, snapshots
+# and niche signals all read the same profile pages). Resets on process restart.
+# Bounded LRU of zlib-compressed pages: IG pages are large and compress well, and a
+# long-running worker must not grow without limit.
+HTML_CACHE_MAX_ENTRIES = int(os.getenv("HTML_CACHE_MAX_ENTRIES", "512"))
+_HTML_CACHE: OrderedDict[str, bytes] = OrderedDict()
+class _Inflight:
+    """A fetch in progress and how many callers are waiting on it."""
+    __slots__ = ("fut", "waiters")
+
+    def __init__(self, fut: asyncio.Future[str]):
+        self.fut = fut
+        self.waiters = 0
+
+# fetches in progress, per loop, so concurrent callers for one url share a single render
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, _Inflight]]" = weakref.WeakKeyDictionary()
 
-    
\ No newline at end of file
+def _cache_get(url: str) -> str | None:
+    blob = _HTML_CACHE.get(url)
+    if blob is None:
+        return None
+    _HTML_CACHE.move_to_end(url)
+    return zlib.decompress(blob).decode("utf-8")
+
+def _cache_put(url: str, html: str) -> None:
+    _HTML_CACHE[url] = zlib.compress(html.encode("utf-8"), 1)
+    _HTML_CACHE.move_to_end(url)
+    while len(_HTML_CACHE) > HTML_CACHE_MAX_ENTRIES:
+        _HTML_CACHE.popitem(last=False)
+
+async def _fetch_into_cache(url: str) -> str:
+    html = await fetch_page_html(url)
+    # don't poison cache with login wall / throttling pages
+    if not _is_login_wall(html):
+        _cache_put(url, html)
+    return html
+
+async def cached_fetch_page_html(url: str) -> str:
+    """
+    fetch_page_html behind the per-process LRU; concurrent requests for a url are coalesced.
+    Cancelling a caller cancels the fetch itself once no other caller is waiting on it.
+    """
+    cached = _cache_get(url)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.setdefault(asyncio.get_running_loop(), {})
+    entry = pending.get(url)
+    if entry is None or entry.fut.cancelled():
+        entry = pending[url] = _Inflight(asyncio.ensure_future(_fetch_into_cache(url)))
+
+        def _forget(_, entry=entry):
+            if pending.get(url) is entry:
+                del pending[url]
+
+        entry.fut.add_done_callback(_forget)
+
+    entry.waiters += 1
+    try:
+        # a cancelled waiter must not cancel the fetch other callers are waiting on...
+        return await asyncio.shield(entry.fut)
+    finally:
+        entry.waiters -= 1
+        # ...but once the last one is gone, nobody wants the page: stop the render
+        if entry.waiters == 0 and not entry.fut.done():
+            entry.fut.cancel()
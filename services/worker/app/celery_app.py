@@ -1,10 +1,16 @@
 import os
+import inspect
 import logging
+import functools
 import structlog
+from structlog.contextvars import bind_contextvars, clear_contextvars
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
 
 from logging_setup import configure_structured_logging
 from db_log_handler import DBLogHandler
+from agents.aio import bg_loop, bg_loop_running, run_async, stop_bg_loop
+from db import SessionLocal, engine
 
 ### Logging setup ###
 
@@ -45,3 +51,105 @@ celery.conf.update(
     task_track_started=True,
     timezone="UTC",
 )
+
+# Messages and results go over Redis as MessagePack (smaller and faster than JSON);
+# JSON is still accepted from producers that haven't switched yet.
+celery.conf.update(
+    task_serializer="msgpack",
+    result_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_accept_content=["msgpack", "json"],
+)
+
+# Tasks here spend their time waiting on Ollama, Chromium, Pexels and Postgres, so the
+# default pool is threads: one interpreter, one browser and one set of HTTP/DB pools
+# shared by CELERY_WORKER_CONCURRENCY tasks in flight. CELERY_WORKER_POOL=prefork
+# restores process isolation. (eventlet/gevent are not used: monkey-patching threading
+# breaks the background asyncio loop that Playwright runs on.)
+WORKER_POOL = os.getenv("CELERY_WORKER_POOL", "threads")
+celery.conf.update(
+    worker_pool=WORKER_POOL,
+    worker_concurrency=int(os.getenv("CELERY_WORKER_CONCURRENCY", "8")),
+)
+
+### Background event loop ###
+# Tasks submit coroutines to one long-lived loop per worker process (agents.aio).
+
+# Chromium is launched once per worker process on the background loop and reused by
+# every task; SCRAPE_BROWSER_WARMUP=false defers the launch to the first scrape.
+SCRAPE_BROWSER_WARMUP = os.getenv("SCRAPE_BROWSER_WARMUP", "true").lower() == "true"
+SCRAPE_SYNC_TIMEOUT = float(os.getenv("SCRAPE_SYNC_TIMEOUT_SECONDS", "120"))
+
+### Task log context ###
+# Every task's log lines carry its name, id and scalar arguments (campaign_id,
+# post_draft_id, limit, ...). Bound here once instead of at the top of each task body.
+
+_LOG_ARG_TYPES = (str, int, float, bool, type(None))
+
+@functools.lru_cache(maxsize=None)
+def _task_signature(task) -> inspect.Signature:
+    return inspect.signature(task.run)
+
+def _task_log_args(task, args, kwargs) -> dict:
+    try:
+        bound = _task_signature(task).bind_partial(*(args or ()), **(kwargs or {}))
+    except TypeError:
+        return {}
+    bound.apply_defaults()
+    return {k: v for k, v in bound.arguments.items() if isinstance(v, _LOG_ARG_TYPES)}
+
+@task_prerun.connect
+def _bind_task_context(sender=None, task_id=None, args=None, kwargs=None, **_):
+    clear_contextvars()
+    bind_contextvars(
+        service=SERVICE_NAME,
+        task=sender.name.removeprefix("tasks."),
+        task_id=task_id,
+        **_task_log_args(sender, args, kwargs),
+    )
+
+@task_postrun.connect
+def _clear_task_context(**_):
+    clear_contextvars()
+
+@task_postrun.connect
+def _remove_session(**_):
+    # drop the task thread's scoped session so its connection goes back to the pool
+    SessionLocal.remove()
+
+@worker_process_init.connect
+def _start_bg_loop(**_):
+    # prefork child: don't reuse pooled connections inherited from the parent
+    engine.dispose(close=False)
+    bg_loop()
+    if SCRAPE_BROWSER_WARMUP:
+        from agents.scrape import _ensure_browser
+        try:
+            run_async(_ensure_browser(), timeout=SCRAPE_SYNC_TIMEOUT)
+        except Exception:
+            log.exception("browser_warmup_failed")
+
+@worker_ready.connect
+def _start_bg_loop_in_worker(**_):
+    # non-prefork pools run tasks in the main process, where worker_process_init never fires
+    if WORKER_POOL != "prefork":
+        _start_bg_loop()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_bg_loop(**_):
+    if not bg_loop_running():
+        return
+    from agents.llm import aclose
+    from agents.scrape import close_browser
+    try:
+        run_async(close_browser(), timeout=30)
+        run_async(aclose(), timeout=10)
+    except Exception:
+        log.exception("browser_shutdown_failed")
+    stop_bg_loop()
+
+def scrape_sync(url: str) -> str:
+    """Sync fetch_page_html for task code, on the process's shared browser."""
+    from agents.scrape import fetch_page_html
+    return run_async(fetch_page_html(url), timeout=SCRAPE_SYNC_TIMEOUT)
@@ -0,0 +1,23 @@
+import os
+
+import orjson
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+# One engine per worker process, shared by every task module.
+DATABASE_URL = os.getenv("DATABASE_URL")
+# sized for CELERY_WORKER_CONCURRENCY task threads checking out a connection each
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_recycle=1800,
+    # JSONB columns (shoot packs, b-roll manifests, fraud flags) encode/decode via orjson
+    json_serializer=lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode(),
+    json_deserializer=orjson.loads,
+)
+
+# Thread-scoped: each pool thread reuses its own session until task_postrun removes it
+# (celery_app), which also hands the connection back to the pool.
+SessionLocal = scoped_session(sessionmaker(bind=engine, autocommit=False, autoflush=False))
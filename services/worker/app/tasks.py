@@ -1,13 +1,13 @@
 import os
-import asyncio
 import time
-import json
+import orjson
+from itertools import islice
 from datetime import datetime, timezone, timedelta, date
 
-from agents.engagement.comments import generate_comment
+from agents.engagement.comments import agenerate_comments
 from agents.engagement.scheduler import schedule_actions
 
-from celery_app import celery
+from celery_app import SCRAPE_SYNC_TIMEOUT, celery, run_async, scrape_sync
 from agents.safety import guardrails_ok
 from agents.content_intel.pipeline import run_content_intel
 
@@ -15,31 +15,158 @@ from agents.scrape import fetch_page_text
 from agents.broll.pexels import get_broll_for_keywords
 
 from agents.content_intel.shoot_pack import generate_shoot_pack
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Integer, String, Text, bindparam, cast, func, literal, null, select, union_all, update
 
 from db_models import EngagementAction, EngagementActionType, EngagementStatus
 from db_models import PostDraft
 from db_models import Creator, OutreachDraft, OutreachCampaign, ApprovalStatus, OutreachStatus, OutreachEvent
 
-from agents.llm import draft
+from agents.llm import NUM_PARALLEL, draft_many
 
 from agents.outreach.discovery import discover_from_hashtags
 from agents.outreach.personalization import build_personalized_dm
 from agents.outreach.fraud_detection import assess_fraud, is_excludable
-from agents.outreach.intel_engine import snapshot_creator, update_growth_fields, compute_niche_signals, best_partner_similarity
+from agents.outreach.intel_engine import load_creator_pages, snapshot_creator, update_growth_fields, compute_niche_signals, best_partner_similarity, build_partner_index
 from agents.graph.builder import ensure_creator, extract_mentions, upsert_edge, build_similarity_edges
+from agents.outreach.similarity import similarity_matrix
 from agents.analytics.viral_patterns import build_report
 
 from db_models import CreatorRelationship, CreatorRelationshipStatus, CreatorEdgeType, CreatorPost, ViralPatternReport
 
 import structlog
-from structlog.contextvars import bind_contextvars, clear_contextvars
 
 ### Database session maker
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+from db import SessionLocal
+
+### Statements built once at import; tasks only bind parameters
+# the b-roll task only needs the two packs, but still locks the row
+POST_DRAFT_PACKS_SKIP_LOCKED = (
+    select(PostDraft.shoot_pack, PostDraft.broll_manifest)
+    .where(PostDraft.id == bindparam("pid"))
+    .with_for_update(skip_locked=True)
+)
+POST_DRAFT_EXISTS = select(PostDraft.id).where(PostDraft.id == bindparam("pid"))
+POST_DRAFT_COPY = select(PostDraft.hook, PostDraft.caption, PostDraft.hashtags, PostDraft.media_notes).where(
+    PostDraft.id == bindparam("pid")
+)
+# Pack writes are plain UPDATEs by id: no ORM flush/dirty-check of the whole row
+SET_SHOOT_PACK = (
+    update(PostDraft)
+    .where(PostDraft.id == bindparam("pid"))
+    .values(shoot_pack=bindparam("pack", type_=PostDraft.shoot_pack.type))
+    .execution_options(synchronize_session=False)
+)
+SET_BROLL_MANIFEST = (
+    update(PostDraft)
+    .where(PostDraft.id == bindparam("pid"))
+    .values(
+        broll_manifest=bindparam("manifest", type_=PostDraft.broll_manifest.type),
+        broll_dir=bindparam("out_dir", type_=PostDraft.broll_dir.type),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# A claimed action whose worker died is claimable again once its lease runs out
+ENGAGEMENT_CLAIM_LEASE = timedelta(minutes=int(os.getenv("ENGAGEMENT_CLAIM_LEASE_MINUTES", "120")))
+
+def _engagement_batch_stmt():
+    # Claims comment actions missing text, plus reads recent generated comments to avoid
+    # repetition, in one round-trip: the claim is an UPDATE ... RETURNING CTE (rows locked
+    # by another worker are skipped, so no action is drafted twice) and the recent side a
+    # plain CTE, UNION ALL'd with a kind tag. UNION ALL doesn't promise order, so callers
+    # re-sort each side. scheduled_for holds the claim time until the real slot is written.
+    is_comment = EngagementAction.action_type == EngagementActionType.comment
+    claimable = (
+        select(EngagementAction.id)
+        .where(is_comment)
+        .where(
+            (
+                (EngagementAction.status == EngagementStatus.pending)
+                & ((EngagementAction.proposed_text == None) | (EngagementAction.proposed_text == ""))  # noqa: E711
+            )
+            | (
+                (EngagementAction.status == EngagementStatus.processing)
+                & (EngagementAction.scheduled_for < bindparam("stale_before"))
+            )
+        )
+        .order_by(EngagementAction.created_at.asc())
+        .limit(bindparam("pending_limit"))
+        .with_for_update(skip_locked=True)
+    )
+    pending_cte = (
+        update(EngagementAction)
+        .where(EngagementAction.id.in_(claimable.scalar_subquery()))
+        .values(status=EngagementStatus.processing, scheduled_for=bindparam("claimed_at"))
+        .returning(
+            EngagementAction.id,
+            EngagementAction.target_caption.label("text"),
+            EngagementAction.target_handle,
+            EngagementAction.target_url,
+            EngagementAction.created_at,
+        )
+        .cte("pending")
+    )
+    recent_cte = (
+        select(EngagementAction.proposed_text.label("text"), EngagementAction.created_at)
+        .where(is_comment)
+        .where(EngagementAction.proposed_text != None)  # noqa: E711
+        .order_by(EngagementAction.created_at.desc())
+        .limit(bindparam("recent_limit"))
+        .cte("recent")
+    )
+    return union_all(
+        select(
+            literal("p").label("kind"),
+            pending_cte.c.id,
+            pending_cte.c.text,
+            pending_cte.c.target_handle,
+            pending_cte.c.target_url,
+            pending_cte.c.created_at,
+        ),
+        select(
+            literal("r"),
+            cast(null(), Integer),
+            recent_cte.c.text,
+            cast(null(), String),
+            cast(null(), Text),
+            recent_cte.c.created_at,
+        ),
+    )
+
+ENGAGEMENT_BATCH = _engagement_batch_stmt()
+ENGAGEMENT_BATCH_SIZE = int(os.getenv("ENGAGEMENT_BATCH_SIZE", "500"))
+
+# Generated comments are written back by COPYing them into a temp table and merging with
+# one UPDATE ... FROM: for hundreds of rows COPY avoids per-row parameter binding.
+# NULL text/notes keep the row's current value.
+_ENGAGEMENT_TMP = """
+CREATE TEMP TABLE engagement_updates (
+    id integer PRIMARY KEY,
+    status text NOT NULL,
+    proposed_text text,
+    scheduled_for timestamp,
+    notes text
+) ON COMMIT DROP
+"""
+_ENGAGEMENT_COPY = "COPY engagement_updates (id, status, proposed_text, scheduled_for, notes) FROM STDIN"
+_ENGAGEMENT_MERGE = """
+UPDATE engagement_actions ea
+SET status = u.status::engagementstatus,
+    proposed_text = COALESCE(u.proposed_text, ea.proposed_text),
+    scheduled_for = u.scheduled_for,
+    notes = COALESCE(u.notes, ea.notes)
+FROM engagement_updates u
+WHERE ea.id = u.id
+"""
+
+def _write_engagement_updates(db, updates: list[tuple]) -> None:
+    """(id, status, proposed_text, scheduled_for, notes) rows, in the session's transaction."""
+    with db.connection().connection.cursor() as cur:
+        cur.execute(_ENGAGEMENT_TMP)
+        with cur.copy(_ENGAGEMENT_COPY) as copy:
+            for row in updates:
+                copy.write_row(row)
+        cur.execute(_ENGAGEMENT_MERGE)
 
 OUTREACH_SYSTEM = """You write short, friendly influencer outreach DMs for Hello To Natural (H2N), a natural body care + wellness brand.
 Rules:
@@ -73,12 +200,6 @@ log = structlog.get_logger(__name__)
 
 @celery.task(name="tasks.content_intel_daily")
 def content_intel_daily():
-    clear_contextvars()
-
-    # Safely bind task id
-    task_id = getattr(content_intel_daily.request, "id", None)
-    bind_contextvars(task="content_intel_daily", task_id=task_id)
-
     start = time.time()
     log.info("task_started")
 
@@ -106,9 +227,6 @@ def content_intel_daily():
 
 @celery.task(name="tasks.build_outreach_batch")
 def build_outreach_batch(campaign_id: int, limit: int = 20):
-    clear_contextvars()
-    task_id = getattr(build_outreach_batch.request, "id", None)
-    bind_contextvars(task="build_outreach_batch", task_id=task_id, campaign_id=campaign_id)
     log.info("task_started", limit=limit)
 
     db = SessionLocal()
@@ -205,66 +323,65 @@ def build_engagement_queue():
     Builds a controlled queue from 'targets' stored in DB.
     MVP: targets are provided via admin UI as EngagementAction rows with action_type=comment and no proposed_text yet.
     """
-    clear_contextvars()
-    task_id = getattr(build_engagement_queue.request, "id", None)
-    bind_contextvars(task="build_engagement_queue", task_id=task_id)
     log.info("task_started")
 
     db = SessionLocal()
+    pending = []
     try:
-        # Find comment actions missing text
-        pending = (
-            db.query(EngagementAction)
-            .filter(EngagementAction.action_type == EngagementActionType.comment)
-            .filter(EngagementAction.status == EngagementStatus.pending)
-            .filter((EngagementAction.proposed_text == None) | (EngagementAction.proposed_text == ""))  # noqa: E711
-            .order_by(EngagementAction.created_at.asc())
-            .limit(60)  # cap
-            .all()
-        )
+        claimed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = db.execute(
+            ENGAGEMENT_BATCH,
+            {
+                "pending_limit": ENGAGEMENT_BATCH_SIZE,
+                "recent_limit": 30,
+                "claimed_at": claimed_at,
+                "stale_before": claimed_at - ENGAGEMENT_CLAIM_LEASE,
+            },
+        ).all()
+        # commit the claim before the slow LLM calls so other workers skip these rows
+        db.commit()
 
+        pending = sorted((r for r in rows if r.kind == "p"), key=lambda r: r.created_at)
         if not pending:
             log.info("no_targets")
             return {"ok": True, "generated": 0}
 
-        # Grab recent generated comments to avoid repetition
-        recent = (
-            db.query(EngagementAction.proposed_text)
-            .filter(EngagementAction.action_type == EngagementActionType.comment)
-            .filter(EngagementAction.proposed_text != None)  # noqa: E711
-            .order_by(EngagementAction.created_at.desc())
-            .limit(30)
-            .all()
-        )
-        recent_comments = [r[0] for r in recent if r and r[0]]
+        recent = sorted((r for r in rows if r.kind == "r"), key=lambda r: r.created_at, reverse=True)
+        # one fixed anti-repetition list for the batch so the drafts can run concurrently
+        recent_comments = tuple(r.text for r in recent if r.text)
+
+        targets = [
+            {
+                "caption": row.text or "",
+                "author": row.target_handle or "",
+                "url": row.target_url or "",
+                "topic_hint": "natural wellness, skincare, herbal living",
+            }
+            for row in pending
+        ]
+        # at most NUM_PARALLEL drafts in flight (Ollama's parallel slots), on the worker's loop
+        comments = run_async(agenerate_comments(targets, recent_comments, concurrency=NUM_PARALLEL))
 
-        # schedule times (default start now)
+        # slots only for the comments that passed, starting once they exist: failed drafts
+        # don't leave gaps in the schedule
         now = datetime.now(timezone.utc).replace(tzinfo=None)
-        scheduled_times = schedule_actions(len(pending), start_at=now, per_hour=25)
+        scheduled_times = iter(schedule_actions(sum(1 for c in comments if c), start_at=now, per_hour=25))
 
         generated = 0
         failed = 0
+        updates: list[tuple] = []
 
-        for i, row in enumerate(pending):
-            target = {
-                "caption": row.target_caption or "",
-                "author": row.target_author or "",
-                "url": row.target_url or "",
-                "topic_hint": "natural wellness, skincare, herbal living",
-            }
-            comment = generate_comment(target, recent_comments=recent_comments)
+        for row, comment in zip(pending, comments):
             if not comment:
-                row.status = EngagementStatus.failed
-                row.notes = "LLM output failed quality rules"
+                updates.append((row.id, EngagementStatus.failed.value, None, None, "LLM output failed quality rules"))
                 failed += 1
                 continue
 
-            row.proposed_text = comment
-            row.scheduled_for = scheduled_times[i]
             # stays pending until admin approves
+            updates.append((row.id, EngagementStatus.pending.value, comment, next(scheduled_times), None))
             generated += 1
-            recent_comments.append(comment)
 
+        _write_engagement_updates(db, updates)
         db.commit()
         log.info("task_finished", generated=generated, failed=failed)
         return {"ok": True, "generated": generated, "failed": failed}
@@ -272,6 +389,16 @@ def build_engagement_queue():
     except Exception as e:
         db.rollback()
         log.exception("task_failed", error=str(e))
+        if pending:
+            # hand the claimed rows back instead of waiting out the lease
+            db.execute(
+                update(EngagementAction)
+                .where(EngagementAction.id.in_([r.id for r in pending]))
+                .where(EngagementAction.status == EngagementStatus.processing)
+                .values(status=EngagementStatus.pending, scheduled_for=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
         raise
     finally:
         db.close()
@@ -285,20 +412,18 @@ def engagement_execute():
 
 @celery.task(name="tasks.scrape_test")
 def scrape_test(url: str):
-    return asyncio.run(fetch_page_text(url))[:2000]
+    return scrape_sync(url)[:2000]
 
 ### Build shoot pack
 
 @celery.task(name="tasks.build_shoot_pack")
 def build_shoot_pack(post_draft_id: int):
-    clear_contextvars()
-    task_id = getattr(build_shoot_pack.request, "id", None)
-    bind_contextvars(task="build_shoot_pack", task_id=task_id, post_draft_id=post_draft_id)
     log.info("task_started")
 
     db = SessionLocal()
     try:
-        pd = db.query(PostDraft).filter(PostDraft.id == post_draft_id).first()
+        pd = db.execute(POST_DRAFT_COPY, {"pid": post_draft_id}).first()
+        db.rollback()  # don't hold a transaction open across the LLM call
         if not pd:
             log.error("not_found")
             return {"ok": False, "error": "PostDraft not found"}
@@ -310,9 +435,10 @@ def build_shoot_pack(post_draft_id: int):
             media_notes=pd.media_notes,
         )
 
-        # store as pretty JSON text
-        pd.shoot_pack = json.dumps(pack, indent=2, ensure_ascii=False)
-        db.add(pd)
+        if db.execute(SET_SHOOT_PACK, {"pid": post_draft_id, "pack": pack}).rowcount == 0:
+            db.rollback()
+            log.error("not_found")
+            return {"ok": False, "error": "PostDraft not found"}
         db.commit()
 
         log.info("task_finished")
@@ -328,33 +454,43 @@ def build_shoot_pack(post_draft_id: int):
 ### Build B-roll pack
 
 @celery.task(name="tasks.build_broll_pack")
-def build_broll_pack(post_draft_id: int):
-    clear_contextvars()
-    task_id = getattr(build_broll_pack.request, "id", None)
-    bind_contextvars(task="build_broll_pack", task_id=task_id, post_draft_id=post_draft_id)
+def build_broll_pack(post_draft_id: int, force: bool = False):
     log.info("task_started")
 
     db = SessionLocal()
     try:
-        pd = db.query(PostDraft).filter(PostDraft.id == post_draft_id).first()
+        # The row stays locked while clips are fetched; a duplicate/retried task for the same
+        # draft skips it instead of downloading the same Pexels clips a second time.
+        pd = db.execute(POST_DRAFT_PACKS_SKIP_LOCKED, {"pid": post_draft_id}).first()
         if not pd:
+            if db.execute(POST_DRAFT_EXISTS, {"pid": post_draft_id}).first() is not None:
+                log.info("already_in_progress")
+                return {"ok": True, "post_draft_id": post_draft_id, "skipped": "in_progress"}
             log.error("not_found")
             return {"ok": False, "error": "PostDraft not found"}
 
         if not pd.shoot_pack:
             return {"ok": False, "error": "Shoot pack not generated yet"}
 
-        pack = json.loads(pd.shoot_pack)
+        pack = pd.shoot_pack or {}
         keywords = pack.get("broll") or pack.get("broll_keywords") or []
         # Normalize to a small list of strings
-        keywords = [str(x).strip() for x in keywords if str(x).strip()]
-        keywords = keywords[:6]  # keep it tight
+        # one strip per item, duplicates dropped before the cut so they don't take a slot
+        keywords = list(islice(dict.fromkeys(filter(None, map(str.strip, map(str, keywords)))), 6))  # keep it tight
+
+        # the manifest only depends on the keywords, so one built from these is still current
+        existing = pd.broll_manifest or {}
+        if not force and existing.get("clips") and existing.get("keywords") == keywords:
+            db.rollback()  # release the row lock
+            log.info("task_finished", skipped="up_to_date")
+            return {"ok": True, "post_draft_id": post_draft_id, "clips": len(existing["clips"]), "skipped": "up_to_date"}
 
         manifest = get_broll_for_keywords(post_draft_id, keywords)
 
-        pd.broll_manifest = json.dumps(manifest, indent=2, ensure_ascii=False)
-        pd.broll_dir = manifest.get("out_dir")
-        db.add(pd)
+        db.execute(
+            SET_BROLL_MANIFEST,
+            {"pid": post_draft_id, "manifest": manifest, "out_dir": manifest.get("out_dir")},
+        )
         db.commit()
 
         log.info("task_finished")
@@ -369,9 +505,6 @@ def build_broll_pack(post_draft_id: int):
 
 @celery.task(name="tasks.build_outreach_followups")
 def build_outreach_followups(campaign_id: int | None = None, days: int = 3, limit: int = 25):
-    clear_contextvars()
-    task_id = getattr(build_outreach_followups.request, "id", None)
-    bind_contextvars(task="build_outreach_followups", task_id=task_id, campaign_id=campaign_id, days=days, limit=limit)
     log.info("task_started")
 
     db = SessionLocal()
@@ -392,20 +525,23 @@ def build_outreach_followups(campaign_id: int | None = None, days: int = 3, limi
 
         targets = q.order_by(OutreachDraft.sent_at.asc()).limit(limit).all()
 
-        made = 0
-        for d in targets:
-            handle = d.creator.handle if d.creator else ""
-            prev = (d.message or "").strip()
-
-            prompt = f"""
+        handles = [d.creator.handle if d.creator else "" for d in targets]
+        prompts = [
+            f"""
 We previously sent this DM to @{handle}:
 
-{prev}
+{(d.message or "").strip()}
 
 Write a follow-up DM to send now.
-"""
+""".strip()
+            for d, handle in zip(targets, handles)
+        ]
+        # all follow-ups are generated concurrently (bounded by OLLAMA_NUM_PARALLEL)
+        msgs = draft_many(prompts, system=FOLLOWUP_SYSTEM, temperature=0.6)
 
-            msg = (draft(prompt.strip(), system=FOLLOWUP_SYSTEM, temperature=0.6) or "").strip()
+        made = 0
+        for d, handle, msg in zip(targets, handles, msgs):
+            msg = (msg or "").strip()
             if not msg:
                 msg = f"Hey @{handle}! Just circling back—would you be open to a gifted collab + optional affiliate code with Hello To Natural? If so I can send quick details. 🙂"
 
@@ -453,20 +589,27 @@ def creator_intel_daily(limit: int = 300):
             .all()
         )
 
-        async def _run():
-            for c in rows:
-                await snapshot_creator(db, c)
-                niche = await compute_niche_signals(db, c)
-                c.niche_score = niche
-                update_growth_fields(db, c)
-                # stash similarity into fraud_flags to avoid a new column for now
-                sim = best_partner_similarity(db, c)
-                ff = c.fraud_flags or {}
-                ff["partner_similarity"] = float(sim)
-                c.fraud_flags = ff
-                c.last_intel_run_at = datetime.utcnow()
-
-        asyncio.run(_run())
+        # partner corpora are tokenized once for the whole run
+        partners = build_partner_index(db)
+
+        # Only the page loads run on the shared background loop; DB writes and scoring
+        # stay in this task's thread so they never stall other tasks' I/O.
+        for c in rows:
+            try:
+                pages = load_creator_pages(c.handle, timeout=SCRAPE_SYNC_TIMEOUT)
+            except TimeoutError:
+                log.warning("intel_fetch_timeout", handle=c.handle)
+                continue
+            snapshot_creator(db, c, pages)
+            c.niche_score = compute_niche_signals(db, c, pages)
+            update_growth_fields(db, c)
+            # stash similarity into fraud_flags to avoid a new column for now
+            sim = best_partner_similarity(db, c, partners) if partners else 0.0
+            ff = c.fraud_flags or {}
+            ff["partner_similarity"] = float(sim)
+            c.fraud_flags = ff
+            c.last_intel_run_at = datetime.utcnow()
+
         db.commit()
         return {"ok": True, "updated": len(rows)}
     except Exception as e:
@@ -477,18 +620,14 @@ def creator_intel_daily(limit: int = 300):
 
 @celery.task(name="tasks.score_creators")
 def score_creators(limit: int = 200):
-    clear_contextvars()
-    task_id = getattr(score_creators.request, "id", None)
-    bind_contextvars(task="score_creators", task_id=task_id, limit=limit)
     log.info("task_started")
 
     db = SessionLocal()
     try:
         creators = db.query(Creator).filter(Creator.score == 0).order_by(Creator.created_at.desc()).limit(int(limit)).all()
 
-        updated = 0
-        for c in creators:
-            prompt = f"""
+        prompts = [
+            f"""
 Creator:
 - handle: @{c.handle}
 - platform: {c.platform}
@@ -497,16 +636,21 @@ Creator:
 - notes: {c.notes}
 
 Score fit for H2N.
-"""
+""".strip()
+            for c in creators
+        ]
+        raws = draft_many(prompts, system=CREATOR_SCORE_SYSTEM, temperature=0.4)
 
-            raw = (draft(prompt.strip(), system=CREATOR_SCORE_SYSTEM, temperature=0.4) or "").strip()
+        updated = 0
+        for c, raw in zip(creators, raws):
+            raw = (raw or "").strip()
 
             score = None
             tags = None
             note = None
 
             try:
-                obj = json.loads(raw)
+                obj = orjson.loads(raw)
                 score = int(obj.get("score", 0))
                 tags = obj.get("niche_tags") or []
                 note = obj.get("note") or ""
@@ -557,14 +701,11 @@ Score fit for H2N.
 @celery.task(name="tasks.creator_discovery_hashtags")
 def creator_discovery_hashtags(limit: int = 200, rotate: int = 4):
     """Discover creators from hashtag pages and insert into creators table."""
-    clear_contextvars()
-    task_id = getattr(creator_discovery_hashtags.request, "id", None)
-    bind_contextvars(task="creator_discovery_hashtags", task_id=task_id)
     log.info("task_started", limit=limit, rotate=rotate)
 
     db = SessionLocal()
     try:
-        result = asyncio.run(discover_from_hashtags(db=db, limit=limit, rotate=rotate))
+        result = discover_from_hashtags(db=db, limit=limit, rotate=rotate)
         db.commit()
         log.info("task_finished", result=result)
         return result
@@ -579,9 +720,6 @@ def creator_discovery_hashtags(limit: int = 200, rotate: int = 4):
 @celery.task(name="tasks.creator_graph_update")
 def creator_graph_update(limit_creators: int = 200, similarity_top_k: int = 25):
     """Build/refresh creator graph edges: mentions + similarity."""
-    clear_contextvars()
-    task_id = getattr(creator_graph_update.request, "id", None)
-    bind_contextvars(task="creator_graph_update", task_id=task_id)
     log.info("task_started", limit_creators=limit_creators)
 
     db = SessionLocal()
@@ -593,15 +731,16 @@ def creator_graph_update(limit_creators: int = 200, similarity_top_k: int = 25):
             .all()
         )
 
-        # Similarity edges across this pool (cheap & useful)
-        for c in creators:
-            build_similarity_edges(db, c, creators, top_k=similarity_top_k)
+        # Similarity edges across this pool (cheap & useful); tags are tokenized once
+        matrix = similarity_matrix(creators)
+        for c, scores in zip(creators, matrix):
+            build_similarity_edges(db, c, creators, top_k=similarity_top_k, scores=scores)
 
         # Mention edges (best-effort scraping)
         for c in creators:
             try:
                 url = f"https://www.instagram.com/{c.handle}/"
-                text = asyncio.run(fetch_page_text(url))
+                text = run_async(fetch_page_text(url), timeout=SCRAPE_SYNC_TIMEOUT)
             except Exception:
                 continue
 
@@ -633,9 +772,6 @@ def creator_graph_update(limit_creators: int = 200, similarity_top_k: int = 25):
 @celery.task(name="tasks.viral_patterns_daily")
 def viral_patterns_daily(limit_posts: int = 500):
     """Create/update a daily viral pattern report from cached creator_posts."""
-    clear_contextvars()
-    task_id = getattr(viral_patterns_daily.request, "id", None)
-    bind_contextvars(task="viral_patterns_daily", task_id=task_id)
     log.info("task_started", limit_posts=limit_posts)
 
     db = SessionLocal()
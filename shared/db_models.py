@@ -1,13 +1,12 @@
 import enum
 from datetime import datetime, date
 from sqlalchemy import (
-    Column, String, Text, Date, DateTime, Integer, Boolean, Enum, ForeignKey, UniqueConstraint, Float
+    Column, String, Text, Date, DateTime, Integer, Boolean, Enum, ForeignKey, UniqueConstraint, Float, Index
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 
-import json
 from functools import cached_property
 
 class Base(DeclarativeBase):
@@ -41,6 +40,7 @@ class EngagementActionType(str, enum.Enum):
 
 class EngagementStatus(str, enum.Enum):
     pending = "pending"      # generated/ready for review
+    processing = "processing"  # claimed by a worker generating its comment
     approved = "approved"    # approved by admin
     executed = "executed"    # manually completed (or executed by runner in the future)
     skipped = "skipped"      # rejected/skipped
@@ -121,29 +121,22 @@ class PostDraft(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
-    shoot_pack: Mapped[str] = mapped_column(Text, nullable=True)          # structured shoot pack text
+    shoot_pack: Mapped[dict] = mapped_column(JSONB, nullable=True)       # structured shoot pack
     posted_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # when you actually posted
     ig_url: Mapped[str] = mapped_column(Text, nullable=True)              # optional IG URL
 
-    broll_manifest: Mapped[str] = mapped_column(Text, nullable=True)  # JSON text
+    broll_manifest: Mapped[dict] = mapped_column(JSONB, nullable=True)
     broll_dir: Mapped[str] = mapped_column(String(255), nullable=True)
 
-    @staticmethod
-    def _safe_json(raw: str | None):
-        if not raw:
-            return None
-        try:
-            return json.loads(raw)
-        except Exception:
-            return {"_error": True, "_raw": raw}
-
+    # Template-facing accessors. Rows that held unparseable text before the JSONB
+    # migration come back as {"_error": true, "_raw": ...}.
     @cached_property
     def shoot_pack_obj(self):
-        return self._safe_json(self.shoot_pack)
+        return self.shoot_pack or None
 
     @cached_property
     def broll_obj(self):
-        return self._safe_json(self.broll_manifest)
+        return self.broll_manifest or None
 
 class EngagementQueueItem(Base):
     __tablename__ = "engagement_queue"
@@ -233,6 +226,10 @@ class Creator(Base):
     is_partner: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
 
+# Case-insensitive handle lookups (filter on func.lower(Creator.handle)).
+Index("ix_creators_handle_lower", func.lower(Creator.handle), unique=True)
+
+
 class CreatorRelationship(Base):
     """Tracks outreach relationship lifecycle to prevent re-contact spam."""
     __tablename__ = "creator_relationships"